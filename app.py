@@ -1,17 +1,65 @@
 import streamlit as st
-import streamlit.components.v1 as components
 from dotenv import load_dotenv
-import google.generativeai as genai 
-from gtts import gTTS 
-import io
+import hashlib
+import time
 
 # Import engines
-from src.llm_engine import extract_knowledge_graph, generate_quiz, generate_summary, get_available_model
-from src.graph_builder import visualize_knowledge_graph
-from src.pdf_generator import create_pdf
+from src.audio_player import play_summary
+from src.llm_engine import get_model, set_model_override, stream_response, MODEL_TTL
+from src.graph_store import GraphStore
+from src.incremental import IncrementalGraph
+from src.jobs import FINISHED, get_runner
+from src.retrieval import TranscriptIndex, build_tutor_prompt
+from src.graph_builder import LOD_AUTO_NODES, LevelOfDetail, graph_payload
+from src.graph_view import graph_view
+from src.knowledge_graph import graph_hash
+from src.pdf_generator import create_pdf, guide_hash
+from src.telemetry import get_tracer, span, stage_summary
 
 load_dotenv()
 
+@st.cache_resource(ttl=MODEL_TTL)
+def load_model(api_key):
+    """One configured GenerativeModel per key, shared across sessions."""
+    return get_model(api_key)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def render_graph_payload(graph_key, layout, _graph_data, _scores=None):
+    """
+    Graph view payload memoized on the graph's content hash plus layout and
+    shared across sessions; underscored args are skipped by Streamlit's hasher.
+    """
+    return graph_payload(_graph_data, layout, _scores)
+
+@st.cache_resource(max_entries=16)
+def load_level_of_detail(graph_key, _graph_data, _scores=None):
+    """Ranked, laid-out level-of-detail view of one graph, shared across sessions."""
+    return LevelOfDetail(_graph_data, _scores)
+
+def current_graph_key():
+    """Content hash of the session's graph, recomputed only when the graph object changes."""
+    data = st.session_state['graph_data']
+    cached = st.session_state.get('graph_key')
+    if cached is None or cached[0] is not data:
+        cached = (data, graph_hash(data))
+        st.session_state['graph_key'] = cached
+    return cached[1]
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def build_pdf(pdf_key, _summary, _graph_data, _quiz_data):
+    """Study guide bytes memoized on the hash of its contents, so repeat downloads are free."""
+    return create_pdf(_summary, _graph_data, _quiz_data)
+
+@st.cache_resource
+def load_store():
+    """Course-wide concept store, one SQLite connection for all sessions."""
+    return GraphStore()
+
+@st.cache_resource(max_entries=32)
+def load_index(transcript):
+    """Retrieval index over the transcript, built once per distinct transcript."""
+    return TranscriptIndex(transcript)
+
 # --- APP CONFIGURATION ---
 st.set_page_config(page_title="VidGraph.ai", layout="wide", page_icon="🧠")
 
@@ -84,6 +132,14 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- SIDEBAR ---
+GRAPH_LAYOUTS = {
+    "Auto": "auto",
+    "Live physics": "physics",
+    "Precomputed (force)": "force",
+    "Precomputed (Kamada-Kawai)": "kamada_kawai",
+    "Level of detail (large graphs)": "lod",
+}
+
 with st.sidebar:
     st.markdown("## ⚙️ Intelligence Hub")
     
@@ -93,6 +149,10 @@ with st.sidebar:
     else:
         api_key = st.text_input("Gemini API Key", type="password")
 
+    # Optional: pin a model and skip discovery
+    if "GEMINI_MODEL" in st.secrets:
+        set_model_override(st.secrets["GEMINI_MODEL"])
+
     st.divider()
     
     # --- NEW NAMES: PERSONA SELECTOR ---
@@ -103,6 +163,28 @@ with st.sidebar:
         index=0
     )
     
+    st.markdown("### 🗺️ Graph Layout")
+    graph_layout = GRAPH_LAYOUTS[st.selectbox(
+        "Node placement:",
+        list(GRAPH_LAYOUTS),
+        index=0,
+        help="Precomputed layouts are calculated once on the server, so large graphs open instantly instead of simulating physics in the browser (Kamada-Kawai is used up to 200 concepts, the force layout above that). Level of detail shows the most important concepts first; click a node to reveal its neighbors.",
+    )]
+    
+    st.markdown("### ⚡ Efficiency")
+    combined_mode = st.toggle(
+        "Single-request mode",
+        help="Ask for graph, quiz and summary in one structured request (uses a third of the input tokens, but the summary doesn't stream).",
+    )
+    live_mode = st.toggle(
+        "🔴 Live transcript",
+        help="For growing captions: if the text only had new lines appended since the last Visualize, just the new part is sent and the graph is extended. Quiz and summary are kept as they are.",
+    )
+    debug_mode = st.toggle(
+        "🛠️ Debug telemetry",
+        help="Show per-stage timings, token counts, cache hits and retries at the bottom of the sidebar.",
+    )
+    
     st.divider()
     st.info("VidGraph transforms unstructured video data into interconnected knowledge maps.")
 
@@ -122,78 +204,184 @@ with col1:
     generate_btn = st.button("🚀 Visualize", type="primary")
 
 # --- LOGIC ---
+# Session keys holding each pipeline job's result
+RESULT_KEYS = {"graph": "graph_data", "quiz": "quiz_data", "summary": "summary_text"}
+JOB_POLL_SECONDS = 0.5  # How often a pending job's progress is re-read
+
 if generate_btn:
     if not api_key:
         st.error("⚠️ System Offline: API Key Missing.")
     elif not transcript_input:
         st.warning("⚠️ Input Required: Please paste source text.")
+    elif live_mode and 'live_graph' in st.session_state and st.session_state['live_graph'].can_extend(transcript_input, persona):
+        # Live captions: only the appended text goes to Gemini
+        live_graph = st.session_state['live_graph']
+        with st.spinner("🔴 Extending live graph..."), span("app.live_update"):
+            st.session_state['graph_data'] = live_graph.update(transcript_input)
+            st.session_state['graph_scores'] = live_graph.pagerank
+        st.session_state['transcript'] = transcript_input
+        if live_graph.last_error:
+            st.warning(f"Live update failed, showing the previous graph. {live_graph.last_error}")
     else:
         st.session_state['transcript'] = transcript_input
         st.session_state['persona'] = persona 
+        for key in list(RESULT_KEYS.values()) + ['live_graph', 'graph_scores']:
+            st.session_state.pop(key, None)
+        st.session_state.messages = [] 
         
-        with st.spinner("🔮 Mapping Neural Connections..."):
-            # Pass the 'persona' to the AI functions
-            graph_data = extract_knowledge_graph(transcript_input, api_key, persona)
-            quiz_data = generate_quiz(transcript_input, api_key, persona)
-            summary_text = generate_summary(transcript_input, api_key, persona)
-            
-            st.session_state['graph_data'] = graph_data
-            st.session_state['quiz_data'] = quiz_data
-            st.session_state['summary_text'] = summary_text
-            st.session_state.messages = [] 
-            
-            st.rerun()
+        # The pipeline runs as a background job, so reruns don't cancel it; an
+        # identical transcript already submitted by any session is reused as is
+        job = get_runner().submit(transcript_input, api_key, persona, combined=combined_mode)
+        st.session_state['job_id'] = job['id']
+        st.session_state['job_live'] = live_mode
+
+
+def collect_job_results(job):
+    """Copies newly finished stages into the session; True if there were any."""
+    arrived = False
+    for task, result in job['results'].items():
+        if RESULT_KEYS[task] in st.session_state:
+            continue
+        st.session_state[RESULT_KEYS[task]] = result
+        arrived = True
+        if task == "graph" and st.session_state.get('job_live') and "error" not in result:
+            # Seed the live graph so later Visualize clicks only send new captions
+            st.session_state['live_graph'] = IncrementalGraph(
+                api_key, st.session_state['persona'], st.session_state['transcript'], result
+            )
+    return arrived
+
+
+STAGE_LABELS = {"graph": "Knowledge graph", "summary": "Summary", "quiz": "Quiz"}
+STAGE_ICONS = {"queued": "⏳", "running": "⏳", "done": "✅", "error": "⚠️"}
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def render_job_progress():
+    """Polls the background job; a full rerun fills in each tab as its stage finishes."""
+    runner = get_runner()
+    job = runner.get(st.session_state['job_id'])
+    if job is None:
+        st.session_state.pop('job_id')
+        st.warning("The background job was lost. Please click Visualize again.")
+        return
+    if runner.is_stale(job):
+        # The process running it is gone (e.g. the app restarted), so start it again
+        job = runner.submit(st.session_state['transcript'], api_key, job['persona'], combined=job['combined'])
+        st.session_state['job_id'] = job['id']
+    arrived = collect_job_results(job)
+    if job['status'] in FINISHED:
+        st.session_state.pop('job_id')
+    if arrived or job['status'] in FINISHED:
+        st.rerun()
+    
+    cols = st.columns(len(STAGE_LABELS))
+    for col, (task, label) in zip(cols, STAGE_LABELS.items()):
+        stage = job['stages'][task]
+        if stage['seconds'] is not None:
+            elapsed = stage['seconds']
+        else:
+            elapsed = time.time() - stage['started'] if stage['started'] else 0
+        col.caption(f"{STAGE_ICONS[stage['status']]} {label} · {stage['status']} · {elapsed:.1f}s")
+    if job['partial_summary'] and 'summary' not in job['results']:
+        with st.expander("🎧 Summary so far", expanded=True):
+            st.markdown(job['partial_summary'])
+
+
+def render_lod_graph(graph_key):
+    """Top concepts first; each click on a node adds its neighbors (only JSON goes to the browser)."""
+    view = load_level_of_detail(graph_key, st.session_state['graph_data'], st.session_state.get('graph_scores'))
+    state = st.session_state.get('lod')
+    if state is None or state['graph'] != graph_key:
+        state = st.session_state['lod'] = {'graph': graph_key, 'expanded': {}, 'last_click': None}
+    
+    # The click that triggered this rerun is already in session state, so apply it before drawing
+    view_key = f"lod-{graph_key}"
+    click = st.session_state.get(view_key)
+    if click and click.get('at') != state['last_click']:
+        state['last_click'] = click['at']
+        state['expanded'][click['expand']] = state['expanded'].get(click['expand'], 0) + 1
+    if state['expanded'] and st.button("↺ Collapse to top concepts"):
+        state['expanded'] = {}
+    
+    payload = view.payload(expanded=state['expanded'])
+    graph_view(payload, height=600, key=view_key)
+
+
+def render_graph():
+    st.subheader(f"Concept Map ({st.session_state.get('persona', 'Standard')})")
+    if "error" in st.session_state['graph_data']:
+        st.error(st.session_state['graph_data']['error'])
+        return
+    layout = graph_layout
+    if layout == "auto" and len(st.session_state['graph_data'].get('nodes', [])) > LOD_AUTO_NODES:
+        layout = "lod"
+    if layout == "lod":
+        with span("app.render_graph", layout=layout):
+            render_lod_graph(current_graph_key())
+        return
+    with span("app.render_graph", layout=layout):
+        payload = render_graph_payload(
+            current_graph_key(), layout, st.session_state['graph_data'], st.session_state.get('graph_scores')
+        )
+        # Keyed by layout too: physics settings only apply to a freshly created view
+        graph_view(payload, height=600, key=f"graph-{current_graph_key()}-{layout}")
+
+
+def render_summary():
+    st.subheader("🎧 Audio Overview")
+    st.caption("Listen to the AI-generated summary of this topic.")
+    
+    summary = st.session_state.get('summary_text', "No summary available.")
+    st.markdown(f"**Text Summary:**\n{summary}")
+    
+    # Finished audio is kept per summary, so reruns replay it without synthesis
+    audio = st.session_state.get('audio')
+    if audio is not None and audio[0] == summary:
+        st.audio(audio[1], format='audio/mp3')
+    elif st.button("▶️ Generate Audio"):
+        try:
+            with st.spinner("Synthesizing voice..."), span("app.audio"):
+                # One player reads the chunks in order; the first plays while the rest synthesize
+                st.session_state['audio'] = (summary, play_summary(summary))
+        except Exception as e:
+            st.error(f"Audio generation failed: {e}")
+
+
+def render_quiz():
+    st.subheader("✅ Knowledge Check")
+    quiz_data = st.session_state.get('quiz_data')
+    if not quiz_data or "error" in quiz_data[0]:
+        st.warning("Quiz unavailable.")
+    else:
+        for i, q in enumerate(quiz_data):
+            with st.expander(f"Question {i+1}: {q['question']}", expanded=True):
+                user_answer = st.radio("Select Answer:", q['options'], key=f"q{i}")
+                if st.button("Submit", key=f"btn{i}"):
+                    if user_answer.strip() == q['answer'].strip():
+                        st.success(f"Correct! {q.get('explanation', '')}")
+                    else:
+                        st.error(f"Incorrect. The correct answer is: {q['answer']}")
+
+
+RENDERERS = {"graph": render_graph, "summary": render_summary, "quiz": render_quiz}
 
 # --- RESULTS DASHBOARD ---
-if 'graph_data' in st.session_state:
+if 'transcript' in st.session_state:
     
     st.markdown("---")
     
+    if 'job_id' in st.session_state:
+        render_job_progress()
+    
     # TABS
-    tab1, tab2, tab3, tab4 = st.tabs(["🗺️ Knowledge Graph", "🎙️ Audio Brief", "📝 Quiz", "💬 AI Chat"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["🗺️ Knowledge Graph", "🎙️ Audio Brief", "📝 Quiz", "💬 AI Chat", "📚 Course Library"])
     
-    # TAB 1: GRAPH
-    with tab1:
-        st.subheader(f"Concept Map ({st.session_state.get('persona', 'Standard')})")
-        if "error" in st.session_state['graph_data']:
-            st.error(st.session_state['graph_data']['error'])
-        else:
-            html_graph = visualize_knowledge_graph(st.session_state['graph_data'])
-            components.html(html_graph, height=600, scrolling=True)
-
-    # TAB 2: AUDIO SUMMARY
-    with tab2:
-        st.subheader("🎧 Audio Overview")
-        st.caption("Listen to the AI-generated summary of this topic.")
-        
-        summary = st.session_state.get('summary_text', "No summary available.")
-        st.markdown(f"**Text Summary:**\n{summary}")
-        
-        if st.button("▶️ Generate Audio"):
-            with st.spinner("Synthesizing voice..."):
-                try:
-                    tts = gTTS(text=summary, lang='en', slow=False)
-                    mp3_fp = io.BytesIO()
-                    tts.write_to_fp(mp3_fp)
-                    st.audio(mp3_fp, format='audio/mp3')
-                except Exception as e:
-                    st.error(f"Audio generation failed: {e}")
-
-    # TAB 3: QUIZ
-    with tab3:
-        st.subheader("✅ Knowledge Check")
-        quiz_data = st.session_state.get('quiz_data')
-        if not quiz_data or "error" in quiz_data:
-            st.warning("Quiz unavailable.")
-        else:
-            for i, q in enumerate(quiz_data):
-                with st.expander(f"Question {i+1}: {q['question']}", expanded=True):
-                    user_answer = st.radio("Select Answer:", q['options'], key=f"q{i}")
-                    if st.button("Submit", key=f"btn{i}"):
-                        if user_answer.strip() == q['answer'].strip():
-                            st.success(f"Correct! {q.get('explanation', '')}")
-                        else:
-                            st.error(f"Incorrect. The correct answer is: {q['answer']}")
+    for task, tab in [("graph", tab1), ("summary", tab2), ("quiz", tab3)]:
+        with tab:
+            if RESULT_KEYS[task] in st.session_state:
+                RENDERERS[task]()
+            else:
+                st.info("⏳ Mapping Neural Connections...")
 
     # TAB 4: CHAT
     with tab4:
@@ -211,30 +399,80 @@ if 'graph_data' in st.session_state:
             with st.chat_message("user"):
                 st.markdown(prompt)
 
-            with st.chat_message("assistant"):
+            with st.chat_message("assistant"), span("app.chat"):
                 try:
-                    genai.configure(api_key=api_key)
-                    model = genai.GenerativeModel(get_available_model())
-                    full_prompt = f"""
-                    Context: {st.session_state['transcript'][:30000]}
-                    Persona: {st.session_state.get('persona', 'Standard')}
-                    Question: {prompt}
-                    """
-                    response = model.generate_content(full_prompt)
-                    st.markdown(response.text)
-                    st.session_state.messages.append({"role": "assistant", "content": response.text})
+                    model = load_model(api_key)
+                    # Only the passages and graph neighbourhood relevant to this question
+                    full_prompt = build_tutor_prompt(
+                        prompt,
+                        load_index(st.session_state['transcript']),
+                        st.session_state.get('graph_data'),
+                        st.session_state.messages[:-1],
+                        st.session_state.get('persona', 'Standard'),
+                    )
+                    stream_stats = {}
+                    answer = st.write_stream(stream_response(model, full_prompt, stream_stats))
+                    if "ttft" in stream_stats:
+                        st.caption(f"First token in {stream_stats['ttft']:.2f}s")
+                    st.session_state.messages.append({"role": "assistant", "content": answer})
                 except Exception as e:
                     st.error(f"Error: {e}")
 
+    # TAB 5: COURSE LIBRARY
+    with tab5:
+        st.subheader("📚 Course Library")
+        st.caption("Concepts from every saved video, merged into one course-wide graph.")
+        store = load_store()
+        
+        graph_data = st.session_state.get('graph_data')
+        if graph_data and "error" not in graph_data:
+            col_title, col_save = st.columns([4, 1])
+            with col_title:
+                video_title = st.text_input("Video title", placeholder="e.g. Lecture 3 - Backpropagation")
+            with col_save:
+                if st.button("💾 Save"):
+                    video_key = hashlib.sha256(st.session_state['transcript'].encode("utf-8")).hexdigest()[:16]
+                    linked = store.ingest(video_key, graph_data, video_title or None)
+                    st.success(f"Saved {linked} concepts.")
+        
+        stats = store.stats()
+        st.markdown(f"**{stats['videos']}** videos · **{stats['concepts']}** concepts · **{stats['edges']}** links")
+        
+        concept = st.text_input("🔎 Look up a concept", placeholder="e.g. gradient descent")
+        if concept:
+            videos = store.videos_for(concept)
+            if not videos:
+                suggestions = store.search(concept)
+                st.info(f"Not found. Similar: {', '.join(suggestions)}" if suggestions else "Not found in the library.")
+            else:
+                st.markdown("**Appears in:** " + ", ".join(v['title'] or v['video_key'] for v in videos))
+                for n in store.neighbors(concept):
+                    arrow = "→" if n['direction'] == 'out' else "←"
+                    st.markdown(f"- {arrow} **{n['label']}** ({n['relation'] or 'related'}, ×{n['weight']:.0f})")
+        elif stats['concepts']:
+            st.markdown("**Most central concepts across the course:**")
+            st.dataframe(store.top_concepts(15), hide_index=True)
+
     # --- FOOTER ACTIONS ---
-    st.markdown("---")
-    col_a, col_b = st.columns([4, 1])
-    with col_b:
-        if st.button("📥 Download PDF Guide"):
-            with st.spinner("Compiling..."):
-                pdf_bytes = create_pdf(
-                    st.session_state['summary_text'],
-                    st.session_state['graph_data'],
-                    st.session_state['quiz_data']
-                )
-                st.download_button("Download PDF", pdf_bytes, "VidGraph_Guide.pdf", "application/pdf")
\ No newline at end of file
+    if all(key in st.session_state for key in RESULT_KEYS.values()):
+        st.markdown("---")
+        col_a, col_b = st.columns([4, 1])
+        with col_b:
+            if st.button("📥 Download PDF Guide"):
+                with st.spinner("Compiling..."), span("app.pdf"):
+                    guide = (st.session_state['summary_text'], st.session_state['graph_data'], st.session_state['quiz_data'])
+                    pdf_bytes = build_pdf(guide_hash(*guide), *guide)
+                    st.download_button("Download PDF", pdf_bytes, "VidGraph_Guide.pdf", "application/pdf")
+
+# --- DEBUG PANEL ---
+if debug_mode:
+    with st.sidebar:
+        st.markdown("### 🛠️ Telemetry")
+        records = get_tracer().memory.recent()
+        if records:
+            st.caption("Per stage, slowest first (counters of a stage include its sub-stages).")
+            st.dataframe(stage_summary(records), hide_index=True)
+            with st.expander("Recent spans"):
+                st.dataframe(records[::-1][:50], hide_index=True)
+        else:
+            st.caption("No spans recorded yet.")
@@ -0,0 +1,172 @@
+"""
+End-to-end benchmark on the offline fake backend (no API key, no network).
+
+Measures, on synthetic transcripts and graphs of increasing size:
+graph extraction, the graph view payloads (and standalone HTML),
+create_pdf, whole Visualize pipelines for several concurrent
+sessions, and background jobs deduplicating repeated submissions; then
+prints the per-stage breakdown recorded by src.telemetry.
+
+    python -m benchmarks.bench_pipeline --latency 0.5
+    python -m benchmarks.bench_pipeline --quick
+"""
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+
+from benchmarks.bench_graph_build import synthetic_graph
+from src.backends import FakeBackend
+from src.cache import NullCache, set_cache
+from src.graph_builder import LevelOfDetail, graph_payload, visualize_knowledge_graph
+from src.jobs import FINISHED, JobRunner, MemoryQueue
+from src.llm_engine import extract_knowledge_graph, set_backend
+from src.pdf_generator import create_pdf
+from src.pipeline import run_pipeline
+from src.telemetry import Tracer, get_tracer, set_tracer, stage_summary
+
+TRANSCRIPT_SIZES = [5_000, 30_000, 120_000, 480_000]
+GRAPH_SIZES = [100, 1_000, 5_000]
+SESSION_COUNTS = [1, 4, 16]
+SYLLABLES = ["ba", "ne", "ro", "ti", "ka", "lu", "mo", "si", "de", "vo", "gra", "phe"]
+
+
+def synthetic_transcript(n_chars, seed=0):
+    """Lecture-like text whose topic words follow a Zipf-like distribution."""
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(3, 5))) for _ in range(400)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    filler = ["the", "and", "of", "is", "we", "so", "this", "that"]
+    sentences, length = [], 0
+    while length < n_chars:
+        words = rng.choices(vocabulary, weights, k=5) + rng.choices(filler, k=5)
+        rng.shuffle(words)
+        sentence = " ".join(words).capitalize() + "."
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(sentences)[:n_chars]
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def bench_extraction(backend, sizes):
+    print(f"\n{'transcript chars':>16} {'requests':>9} {'nodes':>6} {'seconds':>8} {'chars/s':>10}")
+    for n_chars in sizes:
+        transcript = synthetic_transcript(n_chars, seed=n_chars)
+        calls = backend.calls
+        graph, seconds = timed(extract_knowledge_graph, transcript, "offline")
+        print(f"{n_chars:>16} {backend.calls - calls:>9} {len(graph.get('nodes', [])):>6} "
+              f"{seconds:8.3f} {n_chars / seconds:10.0f}")
+
+
+def lod_payload(data):
+    view = LevelOfDetail(data)
+    # Top concepts after one click on the most important one
+    return json.dumps(view.payload(expanded={view.ranked[0]: 1}))
+
+
+def bench_visualize(sizes):
+    """JSON payload the app sends per layout (vis.js is served separately), vs standalone HTML."""
+    print(f"\n{'graph nodes':>11} {'layout':>8} {'cold (s)':>9} {'warm (s)':>9} {'sent KB':>8}")
+    for n_nodes in sizes:
+        data = synthetic_graph(n_nodes)
+        for layout in ("physics", "force", "lod", "html"):
+            if layout == "lod":
+                render = lod_payload
+            elif layout == "html":
+                render = lambda d: visualize_knowledge_graph(d, "force")
+            else:
+                render = lambda d: json.dumps(graph_payload(d, layout))
+            sent, cold = timed(render, data)
+            _, warm = timed(render, data)  # Layout now cached
+            print(f"{n_nodes:>11} {layout:>8} {cold:9.3f} {warm:9.3f} {len(sent) / 1024:8.0f}")
+
+
+def bench_pdf(sizes):
+    quiz = [{"question": f"Question {i}?", "options": ["A", "B", "C", "D"], "answer": "A"} for i in range(3)]
+    print(f"\n{'graph nodes':>11} {'summary chars':>13} {'seconds':>8} {'PDF KB':>7}")
+    for n_nodes in sizes:
+        summary = synthetic_transcript(n_nodes * 5, seed=1)
+        pdf, seconds = timed(create_pdf, summary, synthetic_graph(n_nodes), quiz)
+        print(f"{n_nodes:>11} {len(summary):>13} {seconds:8.3f} {len(pdf) / 1024:7.0f}")
+
+
+def bench_sessions(counts, n_chars):
+    """N users clicking Visualize at once, each on their own transcript."""
+    print(f"\n{'sessions':>8} {'wall (s)':>9} {'sessions/s':>11} {'p50 (s)':>8} {'p95 (s)':>8}")
+    for n_sessions in counts:
+        latencies = []
+        lock = threading.Lock()
+
+        def session(index):
+            transcript = synthetic_transcript(n_chars, seed=1000 * n_sessions + index)
+            _, seconds = timed(run_pipeline, transcript, "offline")
+            with lock:
+                latencies.append(seconds)
+
+        threads = [threading.Thread(target=session, args=(i,)) for i in range(n_sessions)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+        print(f"{n_sessions:>8} {wall:9.3f} {n_sessions / wall:11.2f} "
+              f"{statistics.median(latencies):8.3f} {p95:8.3f}")
+
+
+def bench_jobs(backend, counts, n_chars, distinct=4):
+    """N sessions submitting background jobs, only `distinct` different transcripts among them."""
+    print(f"\n{'sessions':>8} {'distinct':>8} {'jobs run':>8} {'requests':>9} {'wall (s)':>9}")
+    for n_sessions in counts:
+        runner = JobRunner(MemoryQueue())
+        calls = backend.calls
+        started = time.perf_counter()
+        jobs = [runner.submit(synthetic_transcript(n_chars, seed=5000 * n_sessions + i % distinct), "offline")
+                for i in range(n_sessions)]
+        ids = {job["id"] for job in jobs}
+        while any(runner.get(job_id)["status"] not in FINISHED for job_id in ids):
+            time.sleep(0.01)
+        wall = time.perf_counter() - started
+        print(f"{n_sessions:>8} {min(distinct, n_sessions):>8} {len(ids):>8} {backend.calls - calls:>9} {wall:9.3f}")
+        runner.close()
+
+
+def print_stages():
+    print(f"\n{'stage':<18} {'calls':>6} {'total ms':>10} {'max ms':>9} {'prompt tok':>11} {'resp tok':>9}")
+    for row in stage_summary(get_tracer().memory.recent()):
+        print(f"{row['stage']:<18} {row['calls']:>6} {row['total_ms']:10.1f} {row['max_ms']:9.1f} "
+              f"{row['prompt_tokens']:>11} {row['response_tokens']:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline VidGraph pipeline benchmark.")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model seconds per request")
+    parser.add_argument("--quick", action="store_true", help="smallest sizes only")
+    args = parser.parse_args(argv)
+
+    backend = FakeBackend(latency=args.latency, stream_chunk_delay=args.latency / 20)
+    set_backend(backend)
+    set_cache(NullCache())  # Every run does the full work
+    set_tracer(Tracer())
+
+    cut = 2 if args.quick else None
+    print(f"Fake backend: {args.latency}s per request")
+    bench_extraction(backend, TRANSCRIPT_SIZES[:cut])
+    bench_visualize(GRAPH_SIZES[:cut])
+    bench_pdf(GRAPH_SIZES[:cut])
+    bench_sessions(SESSION_COUNTS[:cut], 20_000)
+    bench_jobs(backend, SESSION_COUNTS[:cut], 20_000)
+    print_stages()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import numpy as np
+import scipy.sparse as sp
+
+CORE_TELEPORT = 0.5   # Share of the random-jump mass that lands on core concepts
+BETWEENNESS_BATCH = 64  # BFS sources processed together as columns of one dense block
+
+
+class GraphAnalytics:
+    """
+    Centrality on a CSR adjacency matrix that is built once per graph.
+    Nodes are the integers 0..n-1 (or `ids`, for dict results); parallel
+    edges are summed. Every measure is a NumPy/SciPy vector computation,
+    so repeated queries (warm-started PageRank, personalized variants,
+    betweenness) never rebuild anything.
+    """
+
+    def __init__(self, n, sources, targets, weights=None, directed=True, ids=None):
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        weights = np.ones(len(sources)) if weights is None else np.asarray(weights, dtype=float)
+        if not directed:
+            sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+            weights = np.concatenate([weights, weights])
+
+        self.n = n
+        self.directed = directed
+        self.ids = list(ids) if ids is not None else None
+        self.adjacency = sp.csr_matrix((weights, (sources, targets)), shape=(n, n))
+
+        self.out_weight = np.asarray(self.adjacency.sum(axis=1)).ravel()
+        self.dangling = self.out_weight == 0
+        inv_out = np.divide(1.0, self.out_weight, out=np.zeros(n), where=~self.dangling)
+        # Transposed once, so each PageRank step is a single sparse mat-vec
+        self._transition = (sp.diags(inv_out) @ self.adjacency).T.tocsr()
+        self._hops = None  # Unweighted structure for betweenness, built on first use
+
+        self.converged = True
+        self.iterations = 0
+
+    @classmethod
+    def from_knowledge_graph(cls, graph, directed=True):
+        ids = list(graph.nodes)
+        index = {node_id: i for i, node_id in enumerate(ids)}
+        edges = list(graph.edges.values())
+        return cls(
+            len(ids),
+            [index[e['source']] for e in edges],
+            [index[e['target']] for e in edges],
+            [e['weight'] for e in edges],
+            directed=directed,
+            ids=ids,
+        )
+
+    # --- PAGERANK ---
+    def pagerank(self, damping=0.85, personalization=None, x0=None, tol=1e-8, max_iter=100):
+        """
+        Weighted PageRank by power iteration.
+        personalization: teleport distribution (array or {id: weight}); uniform if None.
+        x0: starting vector (array or {id: score}), e.g. the previous scores
+        of a graph that has only grown a little; nodes it lacks start at 1/n.
+        Dangling-node rank is redistributed like the teleport, as NetworkX does.
+        Stops when the L1 change drops below n * tol; if max_iter is reached
+        first, the last iterate is returned and `converged` is set to False.
+        """
+        n = self.n
+        if n == 0:
+            return np.zeros(0)
+        teleport = self._distribution(personalization, fill=0.0) if personalization is not None else None
+        if teleport is None:
+            teleport = np.full(n, 1.0 / n)
+        rank = self._distribution(x0, fill=1.0 / n) if x0 is not None else None
+        if rank is None:
+            rank = teleport.copy()
+
+        for iteration in range(1, max_iter + 1):
+            new_rank = damping * (self._transition @ rank + rank[self.dangling].sum() * teleport) \
+                + (1 - damping) * teleport
+            delta = np.abs(new_rank - rank).sum()
+            rank = new_rank
+            if delta < n * tol:
+                self.converged, self.iterations = True, iteration
+                return rank
+        self.converged, self.iterations = False, max_iter
+        return rank
+
+    def personalized_pagerank(self, seeds, seed_share=1.0, **kwargs):
+        """
+        PageRank whose random jumps favour `seeds` (indices or ids): they
+        receive `seed_share` of the teleport mass, the rest is uniform.
+        seed_share=1.0 is classic personalized PageRank.
+        """
+        seed_index = self._indices(seeds)
+        if len(seed_index) == 0:
+            return self.pagerank(**kwargs)
+        teleport = np.full(self.n, (1 - seed_share) / self.n)
+        teleport[seed_index] += seed_share / len(seed_index)
+        return self.pagerank(personalization=teleport, **kwargs)
+
+    # --- OTHER MEASURES ---
+    def degree(self):
+        """Weighted degree (in + out for directed graphs), normalized to sum to 1."""
+        degree = self.out_weight + np.asarray(self.adjacency.sum(axis=0)).ravel() if self.directed \
+            else self.out_weight.copy()
+        total = degree.sum()
+        return degree / total if total > 0 else np.full(self.n, 1.0 / max(self.n, 1))
+
+    def betweenness(self, k=None, seed=0, normalized=True):
+        """
+        Shortest-path (hop count) betweenness via level-synchronous Brandes:
+        the BFS and the dependency back-propagation run as sparse mat-mults
+        over a block of sources at once. With `k`, only k random sources are
+        used and the result is rescaled (an estimate, as in NetworkX).
+        """
+        n = self.n
+        if n < 3:
+            return np.zeros(n)
+        if self._hops is None:
+            hops = self.adjacency.copy()
+            hops.data[:] = 1.0
+            self._hops = (hops.tocsr(), hops.T.tocsr())
+        forward, backward = self._hops
+
+        sources = np.arange(n) if k is None or k >= n else \
+            np.random.default_rng(seed).choice(n, size=k, replace=False)
+        scores = np.zeros(n)
+        for start in range(0, len(sources), BETWEENNESS_BATCH):
+            batch = sources[start:start + BETWEENNESS_BATCH]
+            cols = np.arange(len(batch))
+            dist = np.full((n, len(batch)), -1, dtype=np.int64)
+            sigma = np.zeros((n, len(batch)))
+            dist[batch, cols] = 0
+            sigma[batch, cols] = 1.0
+
+            # Forward: shortest-path counts, one BFS level per step
+            frontier = sigma.copy()
+            depth = 0
+            while frontier.any():
+                depth += 1
+                reached = backward @ frontier
+                new = (reached > 0) & (dist < 0)
+                dist[new] = depth
+                sigma[new] = reached[new]
+                frontier = np.where(new, sigma, 0.0)
+
+            # Backward: dependencies flow from each level to the one before it
+            delta = np.zeros_like(sigma)
+            for level in range(depth - 1, 0, -1):
+                coeff = np.where(dist == level, (1.0 + delta) / np.where(sigma > 0, sigma, 1.0), 0.0)
+                delta += np.where(dist == level - 1, sigma * (forward @ coeff), 0.0)
+            delta[batch, cols] = 0.0
+            scores += delta.sum(axis=1)
+
+        scores *= n / len(sources)
+        if not self.directed:
+            scores /= 2
+        if normalized:
+            scale = (n - 1) * (n - 2)
+            scores /= scale if self.directed else scale / 2
+        return scores
+
+    # --- HELPERS ---
+    def to_dict(self, values):
+        """{id: float} for a per-node vector."""
+        ids = self.ids if self.ids is not None else range(self.n)
+        return dict(zip(ids, np.asarray(values).tolist()))
+
+    def _indices(self, keys):
+        if self.ids is None:
+            return np.asarray(list(keys), dtype=np.int64)
+        index = {node_id: i for i, node_id in enumerate(self.ids)}
+        return np.array([index[key] for key in keys if key in index], dtype=np.int64)
+
+    def _distribution(self, values, fill):
+        """Array or {id: value} -> probability vector (None if it sums to zero)."""
+        if isinstance(values, dict):
+            ids = self.ids if self.ids is not None else range(self.n)
+            vector = np.array([values.get(node_id, fill) for node_id in ids], dtype=float)
+        else:
+            vector = np.asarray(values, dtype=float).copy()
+        total = vector.sum()
+        return vector / total if total > 0 and np.isfinite(total) else None
+
+
+def concept_importance(graph, previous=None):
+    """
+    Node importance used for sizing and ranking: directed, weighted PageRank
+    with part of the random-jump mass seeded on core concepts. `previous`
+    scores warm-start the iteration. Falls back to weighted degree only if
+    the result is unusable, so the relative sizing signal is never flattened.
+    Returns {node_id: score}, summing to 1.
+    """
+    if len(graph) == 0:
+        return {}
+    analytics = graph.analytics()
+    core = [node_id for node_id, node in graph.nodes.items() if node.get('type') == 'core']
+    scores = analytics.personalized_pagerank(core, seed_share=CORE_TELEPORT, x0=previous)
+    if not np.all(np.isfinite(scores)):
+        scores = analytics.degree()
+    return analytics.to_dict(scores)
@@ -0,0 +1,202 @@
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.cache import DEFAULT_CACHE_DIR, MemoryCache
+from src.telemetry import propagate, span
+
+CHUNK_CHARS = 400    # Sentences are packed into chunks of at most this many characters
+TTS_WORKERS = 4      # Chunks synthesized at once
+SPEECH_CHARS_PER_SECOND = 15  # Only used to size the silent stub audio
+
+# One silent MPEG-1 Layer III frame: 32 kbps, 44.1 kHz, mono (104 bytes, 1152 samples)
+SILENT_FRAME = b"\xff\xfb\x10\xc0" + bytes(100)
+FRAMES_PER_SECOND = 44100 / 1152
+
+
+def speakable_text(markdown):
+    """Drops Markdown markup (headings, emphasis, bullets, links) the voice would otherwise read."""
+    text = re.sub(r'\[([^\]]*)\]\([^)]*\)', r'\1', markdown)
+    text = re.sub(r'^\s*(#+|[-*+]|\d+\.)\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'[*_`>#]+', '', text)
+    return re.sub(r'[ \t]+', ' ', text).strip()
+
+
+def split_sentences(text, max_chars=CHUNK_CHARS):
+    """
+    Splits text into sentence-aligned chunks of at most `max_chars`.
+    Sentences are packed together so short ones don't each cost a request;
+    a single overlong sentence is split on word boundaries.
+    """
+    sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+|\n+', text) if s.strip()]
+    # Headings and bullets have no full stop; give them one so the voice pauses
+    sentences = [s if s[-1] in ".!?:;" else s + "." for s in sentences]
+    chunks, current = [], ""
+    for sentence in sentences:
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current} {sentence}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# --- BACKENDS ---
+class GTTSBackend:
+    """Google Translate TTS (needs network access)."""
+
+    def __init__(self, lang='en', slow=False, tld='com'):
+        self.lang = lang
+        self.slow = slow
+        self.tld = tld
+
+    @property
+    def voice(self):
+        """Settings that change the audio; part of every cache key."""
+        return {"backend": "gtts", "lang": self.lang, "slow": self.slow, "tld": self.tld}
+
+    def synthesize(self, text):
+        from gtts import gTTS
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=self.lang, slow=self.slow, tld=self.tld).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class SilentBackend:
+    """
+    Offline stub: valid MP3 silence roughly as long as the text would take
+    to read. Used for tests, benchmarks and machines without network access.
+    """
+
+    voice = {"backend": "silent"}
+
+    def synthesize(self, text):
+        frames = max(1, int(len(text) / SPEECH_CHARS_PER_SECOND * FRAMES_PER_SECOND))
+        return SILENT_FRAME * frames
+
+
+BACKENDS = {"gtts": GTTSBackend, "silent": SilentBackend}
+
+
+def get_backend(name=None):
+    """Backend named by `name` or $VIDGRAPH_TTS (default gTTS)."""
+    name = (name or os.getenv("VIDGRAPH_TTS", "gtts")).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown TTS backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
+
+
+# --- CACHE ---
+def audio_key(text, voice):
+    """Content address for one chunk's audio: the text plus every voice setting."""
+    payload = json.dumps([text, voice], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    MP3 bytes per chunk: an in-memory LRU in front of one file per key
+    under the cache directory (so audio survives restarts without bloating
+    the JSON result cache).
+    """
+
+    def __init__(self, directory=None, max_entries=512):
+        self.memory = MemoryCache(max_entries=max_entries)
+        self.directory = directory
+        if directory is not None:
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError:
+                self.directory = None  # Read-only filesystem - memory only
+
+    def get(self, key):
+        data = self.memory.get(key)
+        if data is None and self.directory is not None:
+            try:
+                with open(os.path.join(self.directory, key + ".mp3"), "rb") as f:
+                    data = f.read()
+            except OSError:
+                return None
+            self.memory.set(key, data)
+        return data
+
+    def set(self, key, data):
+        self.memory.set(key, data)
+        if self.directory is not None:
+            path = os.path.join(self.directory, key + ".mp3")
+            try:
+                with open(path + ".tmp", "wb") as f:
+                    f.write(data)
+                os.replace(path + ".tmp", path)
+            except OSError:
+                pass
+
+
+_audio_cache = None
+_audio_cache_lock = threading.Lock()
+
+
+def get_audio_cache():
+    global _audio_cache
+    with _audio_cache_lock:
+        if _audio_cache is None:
+            disabled = os.getenv("VIDGRAPH_CACHE", "on").lower() in ("off", "0", "false")
+            _audio_cache = AudioCache(None if disabled else os.path.join(DEFAULT_CACHE_DIR, "audio"))
+        return _audio_cache
+
+
+# --- SYNTHESIS ---
+def summary_chunks(summary):
+    """The sentence chunks a summary is read out in."""
+    return split_sentences(speakable_text(summary))
+
+
+def synthesize_chunk(text, backend, cache):
+    with span("tts.chunk", chars=len(text)) as s:
+        key = audio_key(text, backend.voice)
+        data = cache.get(key)
+        s.set(cache="hit" if data is not None else "miss")
+        if data is None:
+            data = backend.synthesize(text)
+            cache.set(key, data)
+        return data
+
+
+def stream_audio(summary, backend=None, workers=TTS_WORKERS):
+    """
+    Yields MP3 bytes for each sentence chunk of `summary`, in reading order.
+    All chunks are synthesized in parallel; the first one is yielded as soon
+    as it is ready so playback can start while the rest are still in flight.
+    Cached chunks cost nothing, so a repeat play is instant.
+    """
+    backend = backend or get_backend()
+    cache = get_audio_cache()
+    chunks = summary_chunks(summary)
+    if not chunks:
+        return
+    with span("tts.stream", chunks=len(chunks)), ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        futures = [pool.submit(propagate(synthesize_chunk), chunk, backend, cache) for chunk in chunks]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def synthesize_summary(summary, backend=None):
+    """Whole summary as one MP3 (MPEG frames concatenate cleanly)."""
+    return b"".join(stream_audio(summary, backend))
@@ -0,0 +1,72 @@
+"""
+Streamlit component that plays a summary's audio chunks back to back.
+
+The page (audio_player.html) is served by Streamlit from a local directory,
+and each chunk is written there as an MP3 as soon as it is synthesized.
+One <audio> element walks through the chunk files in order, so playback
+starts with the first chunk and continues without gaps or extra clicks.
+"""
+import functools
+import os
+import time
+
+import streamlit.components.v1 as components
+
+from src.audio import audio_key, get_backend, stream_audio, summary_chunks
+from src.components import install_component
+
+TEMPLATE = os.path.join(os.path.dirname(__file__), "audio_player.html")
+AUDIO_FILE_TTL = 24 * 3600  # Chunk files older than this are removed when a new summary plays
+
+
+@functools.lru_cache(maxsize=1)
+def component_dir():
+    """Directory the player is served from (chunks go in its audio/ folder), assembled once per process."""
+    return install_component("audio_player", {"index.html": TEMPLATE}, subdirs=("audio",))
+
+
+@functools.lru_cache(maxsize=1)
+def player_component():
+    return components.declare_component("audio_player", path=component_dir())
+
+
+def prune(directory, now=None):
+    """Removes chunk files nobody has played for AUDIO_FILE_TTL."""
+    now = time.time() if now is None else now
+    audio_dir = os.path.join(directory, "audio")
+    for name in os.listdir(audio_dir):
+        path = os.path.join(audio_dir, name)
+        try:
+            if now - os.path.getmtime(path) > AUDIO_FILE_TTL:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def publish(path, data):
+    """Writes one chunk where the player can fetch it (atomically, so it is never served half-written)."""
+    if os.path.isfile(path):
+        os.utime(path)  # Already there from an earlier play; keep it from being pruned
+        return
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+
+def play_summary(summary, backend=None, key=None):
+    """
+    Shows one player for the whole summary and synthesizes it chunk by chunk;
+    the player starts on the first chunk while the rest are still in flight.
+    Returns the whole MP3 (MPEG frames concatenate cleanly).
+    """
+    backend = backend or get_backend()
+    directory = component_dir()
+    prune(directory)
+    tracks = [f"audio/{audio_key(chunk, backend.voice)}.mp3" for chunk in summary_chunks(summary)]
+    player_component()(tracks=tracks, key=key, default=None)
+
+    parts = []
+    for track, data in zip(tracks, stream_audio(summary, backend)):
+        publish(os.path.join(directory, track), data)
+        parts.append(data)
+    return b"".join(parts)
@@ -0,0 +1,267 @@
+"""
+Model backends behind llm_engine's model registry.
+
+A backend configures itself for an API key, picks a model name and hands out
+model objects with Gemini's `generate_content(prompt, stream=..., generation_config=...)`
+shape, so every engine function runs unchanged on any of them:
+
+    VIDGRAPH_BACKEND=gemini   live Gemini API (default)
+    VIDGRAPH_BACKEND=fake     offline, deterministic responses
+        VIDGRAPH_FAKE_LATENCY=0.5            seconds per request
+        VIDGRAPH_FAKE_RECORDINGS=calls.jsonl recorded responses to replay
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+from src.rate_limit import estimate_tokens
+
+DEFAULT_MODEL = "models/gemini-1.5-flash"
+
+
+class GeminiBackend:
+    """The google-generativeai SDK."""
+
+    name = "gemini"
+
+    def configure(self, api_key):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+
+    def discover_model(self):
+        """First 'flash' (or 1.5 'pro') model that supports generateContent."""
+        import google.generativeai as genai
+        for m in genai.list_models():
+            if 'generateContent' in m.supported_generation_methods:
+                if 'flash' in m.name: return m.name
+                if 'pro' in m.name and '1.5' in m.name: return m.name
+        return DEFAULT_MODEL
+
+    def create_model(self, model_name):
+        import google.generativeai as genai
+        return genai.GenerativeModel(model_name)
+
+
+# --- FAKE BACKEND ---
+# Prompt kinds, recognised by phrases from the engine's own prompts (first match wins)
+PROMPT_KINDS = [
+    ("repair", "does not parse or does not match the required shape"),
+    ("combined", "You are a study-guide generator"),
+    ("graph_delta", "You are extending an existing Knowledge Graph"),
+    ("graph", "You are a Knowledge Graph creator"),
+    ("quiz", "Generate 3 multiple-choice questions"),
+    ("section_notes", "List the key points of this lecture section"),
+    ("summary", "executive summary"),
+]
+
+
+def prompt_kind(prompt):
+    for kind, marker in PROMPT_KINDS:
+        if marker in prompt:
+            return kind
+    return "chat"
+
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def load_recordings(path):
+    """
+    JSONL of {"response": "..."} lines keyed by either "prompt_sha256" (one
+    exact prompt) or "kind" (any prompt of that kind, e.g. "graph").
+    """
+    by_hash, by_kind = {}, {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "prompt_sha256" in entry:
+                by_hash[entry["prompt_sha256"]] = entry["response"]
+            elif "kind" in entry:
+                by_kind[entry["kind"]] = entry["response"]
+    return by_hash, by_kind
+
+
+class FakeUsage:
+    def __init__(self, prompt, text):
+        self.prompt_token_count = estimate_tokens(prompt)
+        self.candidates_token_count = estimate_tokens(text)
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+
+class FakeResponse:
+    """Looks like a GenerateContentResponse: .text, .usage_metadata, iterable when streamed."""
+
+    def __init__(self, text, prompt, chunk_delay=0.0, sleep=time.sleep):
+        self.text = text
+        self.usage_metadata = FakeUsage(prompt, text)
+        self._chunk_delay = chunk_delay
+        self._sleep = sleep
+
+    def __iter__(self):
+        words = self.text.split(" ")
+        for i in range(0, len(words), 8):
+            if i and self._chunk_delay:
+                self._sleep(self._chunk_delay)
+            yield FakeChunk(" ".join(words[i:i + 8]) + (" " if i + 8 < len(words) else ""))
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """
+    Deterministic stand-in for a GenerativeModel. Responses are replayed from
+    recordings when available, otherwise synthesized from the transcript text
+    in the prompt (concepts = its most frequent long words), so graph size
+    grows with the input like it does with the real model.
+    """
+
+    def __init__(self, model_name, backend):
+        self.model_name = model_name
+        self._backend = backend
+
+    def generate_content(self, prompt, stream=False, generation_config=None, **kwargs):
+        backend = self._backend
+        backend.record_call()
+        backend.sleep(backend.request_latency(prompt))
+        kind = "combined" if generation_config is not None else prompt_kind(prompt)
+        text = backend.by_hash.get(prompt_hash(prompt)) or backend.by_kind.get(kind) \
+            or synthesize(kind, prompt, backend.max_nodes)
+        chunk_delay = backend.stream_chunk_delay if stream else 0.0
+        return FakeResponse(text, prompt, chunk_delay, backend.sleep)
+
+
+def concepts_in(text, limit):
+    """Most frequent words of 5+ letters, in first-seen order among ties (deterministic)."""
+    words = [w.lower() for w in re.findall(r"[A-Za-z]{5,}", text)]
+    ranked = Counter(words).most_common(limit)
+    return [word.capitalize() for word, _ in ranked]
+
+
+def section(prompt, start, end=None):
+    """Text between two markers of a prompt (the transcript part)."""
+    begin = prompt.find(start)
+    if begin < 0:
+        return prompt
+    begin += len(start)
+    finish = prompt.find(end, begin) if end else -1
+    return prompt[begin:finish if finish >= 0 else len(prompt)]
+
+
+def fake_graph(text, max_nodes):
+    labels = concepts_in(text, max(5, min(max_nodes, len(text) // 300)))
+    nodes = [{"id": label, "label": label, "type": "core" if i < 4 else "sub"} for i, label in enumerate(labels)]
+    rng = random.Random(len(labels))  # Same text, same cross-links
+    edges = []
+    for i in range(1, len(labels)):
+        edges.append({"source": labels[(i - 1) // 3], "target": labels[i], "label": "includes"})
+        if i >= 7:
+            edges.append({"source": labels[i], "target": labels[rng.randrange(i - 1)], "label": "relates to"})
+    return {"nodes": nodes, "edges": edges}
+
+
+def fake_quiz(text):
+    labels = concepts_in(text, 7) or ["Topic"]
+    questions = []
+    for i in range(3):
+        answer = labels[i % len(labels)]
+        options = [answer] + [label for label in labels if label != answer][:3]
+        questions.append({
+            "question": f"Which concept does the lecture cover in part {i + 1}?",
+            "options": options,
+            "answer": answer,
+            "explanation": f"{answer} is discussed in the transcript.",
+        })
+    return questions
+
+
+def fake_summary(text):
+    labels = concepts_in(text, 6) or ["the topic"]
+    return "\n".join(f"* **{label}:** a key idea of this lecture." for label in labels)
+
+
+def synthesize(kind, prompt, max_nodes):
+    if kind == "graph":
+        return json.dumps(fake_graph(section(prompt, "Transcript:", "Output STRICTLY JSON"), max_nodes))
+    if kind == "graph_delta":
+        text = section(prompt, "New transcript text:", "Return ONLY")
+        return json.dumps(fake_graph(text, max_nodes))
+    if kind == "quiz":
+        return json.dumps(fake_quiz(section(prompt, "Transcript:", "Output STRICTLY JSON")))
+    if kind == "combined":
+        text = section(prompt, "Transcript:")
+        return json.dumps({"graph": fake_graph(text, max_nodes), "quiz": fake_quiz(text),
+                           "summary": fake_summary(text)})
+    if kind == "repair":
+        # The broken JSON is the last part of the repair prompt; hand back a valid empty shape
+        return '{"nodes": [], "edges": []}' if '"nodes"' in prompt else "[]"
+    if kind == "section_notes":
+        return fake_summary(prompt)
+    if kind == "summary":
+        return fake_summary(section(prompt, "Transcript:"))
+    return "Based on the lecture: " + fake_summary(prompt[-2000:])
+
+
+class FakeBackend:
+    """
+    Offline backend for tests and benchmarks. `latency` seconds (plus up to
+    `jitter` extra, from a seeded RNG) are spent per request; streamed
+    responses also pause `stream_chunk_delay` between chunks.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency=0.0, jitter=0.0, stream_chunk_delay=0.0, recordings=None,
+                 max_nodes=60, seed=0, sleep=time.sleep):
+        self.latency = latency
+        self.jitter = jitter
+        self.stream_chunk_delay = stream_chunk_delay
+        self.max_nodes = max_nodes
+        self.sleep = sleep
+        self.by_hash, self.by_kind = load_recordings(recordings) if recordings else ({}, {})
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def configure(self, api_key):
+        pass
+
+    def discover_model(self):
+        return "models/fake"
+
+    def create_model(self, model_name):
+        return FakeModel(model_name, self)
+
+    def record_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def request_latency(self, prompt):
+        with self._lock:
+            return self.latency + self._rng.random() * self.jitter
+
+
+BACKENDS = {"gemini": GeminiBackend, "fake": FakeBackend}
+
+
+def backend_from_env():
+    """Backend named by $VIDGRAPH_BACKEND (default gemini), configured from the environment."""
+    name = os.getenv("VIDGRAPH_BACKEND", "gemini").lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown model backend '{name}' (choose from {', '.join(BACKENDS)})")
+    if name == "fake":
+        return FakeBackend(
+            latency=float(os.getenv("VIDGRAPH_FAKE_LATENCY", "0")),
+            recordings=os.getenv("VIDGRAPH_FAKE_RECORDINGS") or None,
+        )
+    return GeminiBackend()
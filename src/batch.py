@@ -0,0 +1,192 @@
+"""
+Headless batch mode: builds graphs, quizzes, summaries and PDFs for a whole
+directory (or JSONL manifest) of transcripts.
+
+    python -m src.batch transcripts/ out/ --concurrency 4 --rpm 15 --tpm 1000000
+
+Each item is written to OUT/<id>/ and marked done with a done.json file, so
+re-running the same command skips finished items and retries failed ones.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from src.graph_builder import visualize_knowledge_graph
+from src.llm_client import set_rate_limiter
+from src.pdf_generator import create_pdf
+from src.pipeline import TASKS, run_pipeline
+from src.rate_limit import RateLimiter
+
+TRANSCRIPT_EXTENSIONS = (".txt", ".md", ".vtt", ".srt")
+DONE_MARKER = "done.json"
+# Seconds each stage of an item may take. Much longer than the app's deadlines:
+# with --rpm/--tpm set, most of it can be spent waiting for the rate limiter.
+BATCH_TIMEOUT = 1800
+
+
+def slugify(name):
+    return re.sub(r'[^A-Za-z0-9._-]+', '-', name).strip('-') or "item"
+
+
+def make_ids_unique(items):
+    """Suffixes repeated ids (lec0.txt and lec0.md -> lec0, lec0-2) so no two items share OUT/<id>/."""
+    seen = {item["id"] for item in items}
+    used = set()
+    for item in items:
+        if item["id"] in used:
+            suffix = 2
+            while f"{item['id']}-{suffix}" in seen:
+                suffix += 1
+            item["id"] = f"{item['id']}-{suffix}"
+            seen.add(item["id"])
+        used.add(item["id"])
+    return items
+
+
+def load_items(source, default_persona):
+    """
+    Reads the work list as dicts with id, transcript and persona.
+    `source` is either a directory of transcript files or a JSONL manifest whose
+    lines hold "transcript" (inline text) or "path", plus optional "id"/"persona".
+    """
+    items = []
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.lower().endswith(TRANSCRIPT_EXTENSIONS):
+                with open(os.path.join(source, name), encoding="utf-8") as f:
+                    items.append({"id": slugify(os.path.splitext(name)[0]), "transcript": f.read(),
+                                  "persona": default_persona})
+        return make_ids_unique(items)
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "transcript" not in entry:
+                path = os.path.join(base, entry["path"])
+                with open(path, encoding="utf-8") as tf:
+                    entry["transcript"] = tf.read()
+            default_id = os.path.splitext(os.path.basename(entry.get("path", "")))[0] or f"item-{line_no}"
+            items.append({"id": slugify(str(entry.get("id", default_id))), "transcript": entry["transcript"],
+                          "persona": entry.get("persona", default_persona)})
+    return make_ids_unique(items)
+
+
+def write_file(path, data, mode="w"):
+    """Writes via a temp file and rename, so a crash never leaves half a file behind."""
+    tmp = path + ".tmp"
+    with open(tmp, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def process_item(item, out_dir, api_key, combined=False, make_pdf=True, timeout=BATCH_TIMEOUT):
+    """Runs the full pipeline for one transcript; returns (id, error or None, seconds)."""
+    started = time.perf_counter()
+    item_dir = os.path.join(out_dir, item["id"])
+    os.makedirs(item_dir, exist_ok=True)
+
+    timeouts = {task: timeout for task in TASKS}
+    results = run_pipeline(item["transcript"], api_key, item["persona"], timeouts=timeouts, combined=combined)
+    graph, quiz, summary = results["graph"], results["quiz"], results["summary"]
+
+    errors = []
+    if "error" in graph:
+        errors.append(graph["error"])
+    if not quiz or "error" in quiz[0]:
+        errors.append(f"Quiz Error: {quiz[0]['error'] if quiz else 'no questions'}")
+    if summary.startswith("Error generating summary"):
+        errors.append(summary)
+
+    # Write whatever succeeded, even if the item as a whole has to be retried
+    if "error" not in graph:
+        write_file(os.path.join(item_dir, "graph.json"), json.dumps(graph, indent=2, ensure_ascii=False))
+        write_file(os.path.join(item_dir, "graph.html"), visualize_knowledge_graph(graph, "force"))
+    if quiz and "error" not in quiz[0]:
+        write_file(os.path.join(item_dir, "quiz.json"), json.dumps(quiz, indent=2, ensure_ascii=False))
+    if not summary.startswith("Error generating summary"):
+        write_file(os.path.join(item_dir, "summary.md"), summary)
+
+    if errors:
+        return item["id"], "; ".join(errors), time.perf_counter() - started
+
+    if make_pdf:
+        # Written straight to disk, then renamed into place like write_file does
+        pdf_path = os.path.join(item_dir, "guide.pdf")
+        create_pdf(summary, graph, quiz, pdf_path + ".tmp")
+        os.replace(pdf_path + ".tmp", pdf_path)
+
+    elapsed = time.perf_counter() - started
+    write_file(os.path.join(item_dir, DONE_MARKER), json.dumps({
+        "id": item["id"],
+        "persona": item["persona"],
+        "seconds": round(elapsed, 2),
+        "nodes": len(graph["nodes"]),
+        "questions": len(quiz),
+    }))
+    return item["id"], None, elapsed
+
+
+def run_batch(items, out_dir, api_key, concurrency=4, combined=False, make_pdf=True, force=False,
+              timeout=BATCH_TIMEOUT):
+    """Processes items on a bounded worker pool; returns the ids that failed."""
+    os.makedirs(out_dir, exist_ok=True)
+    todo = [it for it in items if force or not os.path.exists(os.path.join(out_dir, it["id"], DONE_MARKER))]
+    print(f"{len(items)} transcripts, {len(items) - len(todo)} already done, {len(todo)} to process", flush=True)
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(process_item, it, out_dir, api_key, combined, make_pdf, timeout): it for it in todo}
+        for done_count, future in enumerate(as_completed(futures), 1):
+            try:
+                item_id, error, elapsed = future.result()
+            except Exception as e:
+                item_id, error, elapsed = futures[future]["id"], str(e), 0.0
+            status = "ok" if error is None else f"FAILED: {error}"
+            print(f"[{done_count}/{len(todo)}] {item_id} ({elapsed:.1f}s) {status}", flush=True)
+            if error is not None:
+                failed.append(item_id)
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-build VidGraph study material for many transcripts.")
+    parser.add_argument("source", help="directory of transcripts, or a JSONL manifest")
+    parser.add_argument("out_dir", help="output directory (one sub-folder per transcript)")
+    parser.add_argument("--persona", default="Standard", help="default learning mode")
+    parser.add_argument("--concurrency", type=int, default=4, help="transcripts processed at once")
+    parser.add_argument("--rpm", type=float, default=None, help="max Gemini requests per minute")
+    parser.add_argument("--tpm", type=float, default=None, help="max estimated input tokens per minute")
+    parser.add_argument("--timeout", type=float, default=BATCH_TIMEOUT,
+                        help=f"seconds each stage of an item may take, rate-limit waits included (default {BATCH_TIMEOUT})")
+    parser.add_argument("--combined", action="store_true", help="one structured request per transcript")
+    parser.add_argument("--no-pdf", action="store_true", help="skip the PDF study guide")
+    parser.add_argument("--force", action="store_true", help="re-process items already marked done")
+    parser.add_argument("--api-key", default=None, help="Gemini API key (default: $GOOGLE_API_KEY)")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    api_key = args.api_key or os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        parser.error("no API key: pass --api-key or set GOOGLE_API_KEY")
+
+    set_rate_limiter(RateLimiter(args.rpm, args.tpm))
+    items = load_items(args.source, args.persona)
+    failed = run_batch(items, args.out_dir, api_key, args.concurrency, args.combined, not args.no_pdf, args.force,
+                       args.timeout)
+    if failed:
+        print(f"{len(failed)} failed: {', '.join(failed)} (re-run to retry)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = os.getenv("VIDGRAPH_CACHE_DIR", ".vidgraph_cache")
+
+
+def make_key(transcript, persona, task, model_name, prompt_version):
+    """Content address for one LLM result: any input change gives a new key."""
+    payload = json.dumps([transcript, persona, task, model_name, prompt_version], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class NullCache:
+    """Cache that never stores anything (used when caching is disabled)."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+
+class MemoryCache:
+    """Thread-safe in-process LRU with an optional TTL (seconds)."""
+
+    def __init__(self, max_entries=256, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, created = entry
+            if self.ttl is not None and time.time() - created > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class DiskCache:
+    """
+    SQLite-backed cache of JSON values.
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted once the stored payload grows past `max_bytes`.
+    """
+
+    def __init__(self, path=None, max_bytes=200 * 1024 * 1024, ttl=30 * 24 * 3600):
+        if path is None:
+            os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
+            path = os.path.join(DEFAULT_CACHE_DIR, "results.sqlite3")
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed)")
+        self._db.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self.ttl is not None and now - created > self.ttl:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        return json.loads(value)
+
+    def set(self, key, value):
+        text = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, text, len(text.encode("utf-8")), now, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now):
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until we are back under budget
+        for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+class TieredCache:
+    """Memory LRU in front of a disk cache; disk hits are promoted to memory."""
+
+    def __init__(self, memory=None, disk=None):
+        self.memory = memory or MemoryCache()
+        self.disk = disk
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Returns the process-wide result cache, building the default one on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            if os.getenv("VIDGRAPH_CACHE", "on").lower() in ("off", "0", "false"):
+                _cache = NullCache()
+            else:
+                try:
+                    _cache = TieredCache(MemoryCache(), DiskCache())
+                except (OSError, sqlite3.Error):
+                    # Read-only filesystem etc. - fall back to memory only
+                    _cache = TieredCache(MemoryCache())
+        return _cache
+
+
+def set_cache(cache):
+    """Plugs in a different cache backend (anything with get/set)."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
@@ -0,0 +1,102 @@
+import re
+
+MAX_CHARS = 30000      # Largest slice of transcript sent in a single prompt
+CHUNK_OVERLAP = 1000   # Characters repeated between neighbouring chunks
+
+# Split after sentence punctuation, before a timestamp line ("00:12", "[1:02:03]"), or on blank lines
+_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n+(?=\[?\d{1,2}:\d{2})|\n{2,}')
+
+
+def iter_units(text):
+    """Yields sentence/timestamp-sized pieces of the transcript; joined they give back the text."""
+    start = 0
+    for match in _BOUNDARY.finditer(text):
+        if match.start() > start:
+            yield text[start:match.end()]
+            start = match.end()
+    if start < len(text):
+        yield text[start:]
+
+
+def iter_chunks(text, max_chars=MAX_CHARS, overlap=CHUNK_OVERLAP):
+    """
+    Streams the transcript as chunks of at most `max_chars`.
+    Chunks end on sentence or timestamp boundaries, and each chunk repeats
+    roughly `overlap` characters from the end of the previous one so concepts
+    spanning a boundary are seen whole at least once.
+    """
+    if len(text) <= max_chars:
+        yield text
+        return
+
+    current, size = [], 0
+    for unit in iter_units(text):
+        # A single run-on "sentence" longer than a chunk gets hard-split
+        while len(unit) > max_chars:
+            unit_head, unit = unit[:max_chars], unit[max_chars:]
+            if current:
+                yield "".join(current)
+                current, size = [], 0
+            yield unit_head
+
+        if size + len(unit) > max_chars and current:
+            yield "".join(current)
+            # Carry the tail of this chunk forward as overlap
+            carried, carried_size = [], 0
+            for prev in reversed(current):
+                if carried_size + len(prev) > overlap:
+                    break
+                carried.insert(0, prev)
+                carried_size += len(prev)
+            current, size = carried, carried_size
+
+        current.append(unit)
+        size += len(unit)
+
+    if current:
+        yield "".join(current)
+
+
+def normalize_label(label):
+    """Canonical form used to spot the same concept across chunks."""
+    label = re.sub(r'[^\w\s]', ' ', str(label).lower())
+    return " ".join(label.split())
+
+
+def merge_graphs(graphs):
+    """
+    Merges partial knowledge graphs into one.
+    Nodes are deduplicated by normalized label (the first id seen wins and a
+    "core" type beats "sub"); edges are re-pointed at the surviving ids and unioned.
+    Every chunk numbers its nodes from "1", so a new concept whose id is
+    already taken by another one is renamed ("1-2", "1-3", ...).
+    """
+    nodes = {}        # normalized label -> node dict
+    taken = set()     # ids of the merged nodes
+    edges = {}        # (source, target, label) -> edge dict
+
+    for graph in graphs:
+        id_map = {}
+        for node in graph.get('nodes', []):
+            norm = normalize_label(node.get('label', node['id']))
+            if norm not in nodes:
+                node_id, suffix = node['id'], 1
+                while node_id in taken:
+                    suffix += 1
+                    node_id = f"{node['id']}-{suffix}"
+                nodes[norm] = dict(node, id=node_id)
+                taken.add(node_id)
+            elif node.get('type') == 'core':
+                nodes[norm]['type'] = 'core'
+            id_map[node['id']] = nodes[norm]['id']
+
+        for edge in graph.get('edges', []):
+            source = id_map.get(edge['source'])
+            target = id_map.get(edge['target'])
+            if source is None or target is None or source == target:
+                continue
+            key = (source, target, edge.get('label', ''))
+            if key not in edges:
+                edges[key] = dict(edge, source=source, target=target)
+
+    return {"nodes": list(nodes.values()), "edges": list(edges.values())}
@@ -0,0 +1,40 @@
+"""
+Shared setup of the app's local Streamlit components (graph_view,
+audio_player). Each is a directory of files Streamlit serves itself,
+assembled under the cache directory.
+"""
+import os
+import shutil
+import tempfile
+
+from src.cache import DEFAULT_CACHE_DIR
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _copy_files(directory, files, subdirs=()):
+    """Copies any missing or outdated file of `files` ({name: source path}) into `directory`."""
+    os.makedirs(directory, exist_ok=True)
+    for subdir in subdirs:
+        os.makedirs(os.path.join(directory, subdir), exist_ok=True)
+    for name, source in files.items():
+        target = os.path.join(directory, name)
+        if os.path.isfile(target) and _read(target) == _read(source):
+            continue
+        shutil.copyfile(source, target + ".tmp")
+        os.replace(target + ".tmp", target)
+    return directory
+
+
+def install_component(name, files, subdirs=()):
+    """
+    Assembles component `name` in DEFAULT_CACHE_DIR/<name> (or a temp dir if
+    the cache dir is read-only) and returns the directory to serve it from.
+    """
+    try:
+        return _copy_files(os.path.join(DEFAULT_CACHE_DIR, name), files, subdirs)
+    except OSError:
+        return _copy_files(tempfile.mkdtemp(prefix=f"vidgraph-{name.replace('_', '-')}-"), files, subdirs)
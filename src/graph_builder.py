@@ -1,92 +1,139 @@
-import networkx as nx
-from pyvis.network import Network
+import json
+import os
+import re
 import textwrap
 
-def visualize_knowledge_graph(data):
+from pyvis.network import Network
+
+from src.analytics import concept_importance
+from src.knowledge_graph import KnowledgeGraph, graph_hash
+from src.layout import AUTO_STATIC_NODES, canvas_positions
+from src.telemetry import annotate, span, traced
+
+# Where standalone HTML (batch graph.html) gets vis.js: "in_line" embeds
+# pyvis's bundled copy (~700 KB, opens offline), "remote" links the cdnjs one.
+# The app itself draws through src.graph_view, which serves vis.js locally.
+VIS_ASSETS = os.getenv("VIDGRAPH_VIS_ASSETS", "in_line")
+# pyvis' page links Bootstrap from a CDN whatever the setting; it only styles the card around the graph
+REMOTE_TAGS = re.compile(r'<link[^>]*href="https?://[^"]*"[^>]*/>|<script[^>]*src="https?://[^"]*"[^>]*>\s*</script>')
+
+LOD_TOP_K = 150        # Level-of-detail view: most important concepts shown first
+LOD_EXPAND = 40        # Neighbors revealed per click on a node
+LOD_AUTO_NODES = 500   # "auto" switches the app to the level-of-detail view above this
+
+# Aggressive 'Avoid Overlap' physics for graphs drawn without a precomputed layout
+PHYSICS = {
+    "barnesHut": {
+        "gravitationalConstant": -30000,
+        "centralGravity": 0.3,
+        "springLength": 300,
+        "springConstant": 0.05,
+        "damping": 0.09,
+        "avoidOverlap": 1
+    }
+}
+
+
+def node_style(node, score):
+    """Color, size, wrapped label and tooltip of one concept (shared by both renderers)."""
+    full_label = node['label']
+    return {
+        # Color Logic: Vibrant Coral for core concepts, Fresh Teal for the rest
+        'color': "#FF6B6B" if node.get('type') == 'core' else "#4ECDC4",
+        'size': 10 + (score * 80),
+        # LABEL FIX: Wrap text nicely
+        'label': "\n".join(textwrap.wrap(full_label, width=20)),
+        # TOOLTIP FIX: "Relevance: 10%"
+        'title': f"{full_label}\nRelevance: {score:.0%}",
+    }
+
+
+@traced("graph.render")
+def visualize_knowledge_graph(data, layout="auto", pagerank_scores=None):
     """
     Generates the HTML for the graph with:
     1. Multi-line Labels (Full text, wrapped nicely)
-    2. Aggressive 'Avoid Overlap' physics
+    2. Aggressive 'Avoid Overlap' physics, or a precomputed layout
     3. 'Relevance: 10%' Tooltips
     4. Fullscreen Button
+
+    layout: "physics" lets the browser simulate Barnes-Hut; "force", "spring"
+    or "kamada_kawai" compute fixed positions server-side (cached per graph)
+    so the browser only draws; "auto" precomputes for large graphs.
+    pagerank_scores: precomputed importance (e.g. from an IncrementalGraph);
+    otherwise directed, weighted PageRank seeded on core concepts is computed.
     """
     
     # --- STEP 1: CALCULATE IMPORTANCE (PageRank) ---
-    nx_graph = nx.Graph()
-    for node in data['nodes']:
-        nx_graph.add_node(node['id'], label=node['label'], type=node.get('type'))
-    for edge in data['edges']:
-        # NETWORKX FIX: Only add edge if both nodes exist in the data
-        # (This prevents crashes if the AI hallucinates an edge)
-        all_node_ids = [n['id'] for n in data['nodes']]
-        if edge['source'] in all_node_ids and edge['target'] in all_node_ids:
-            nx_graph.add_edge(edge['source'], edge['target'])
+    # KnowledgeGraph indexes nodes once and drops edges to unknown nodes
+    # (this prevents crashes if the AI hallucinates an edge)
+    graph = KnowledgeGraph.from_data(data)
+    annotate(nodes=len(graph), edges=len(graph.edges))
         
-    try:
-        pagerank_scores = nx.pagerank(nx_graph)
-    except:
-        pagerank_scores = {node['id']: 0.1 for node in data['nodes']}
+    if pagerank_scores is None:
+        with span("graph.pagerank"):
+            pagerank_scores = concept_importance(graph)
+
+    if layout == "auto":
+        layout = "force" if len(graph) > AUTO_STATIC_NODES else "physics"
+    annotate(layout=layout)
+    positions = {}
+    if layout != "physics":
+        with span("graph.layout", method=layout):
+            positions = canvas_positions(graph, graph_hash(data), layout)
 
     # --- STEP 2: BUILD VISUAL NETWORK ---
-    net = Network(height="600px", width="100%", bgcolor="#ffffff", font_color="#333333", cdn_resources='remote')
+    net = Network(height="600px", width="100%", bgcolor="#ffffff", font_color="#333333", cdn_resources=VIS_ASSETS)
     
-    # Track added nodes to prevent edge errors
-    added_node_ids = set()
-
-    for node in data['nodes']:
-        score = pagerank_scores.get(node['id'], 0.1)
-        
-        # Color Logic
-        if node.get('type') == 'core':
-            color = "#FF6B6B"  # Vibrant Coral
-        else:
-            color = "#4ECDC4"  # Fresh Teal
-            
-        size = 10 + (score * 80)
-        
-        # LABEL FIX: Wrap text nicely
-        full_label = node['label']
-        wrapped_label = "\n".join(textwrap.wrap(full_label, width=20)) 
+    # Node and edge dicts go straight into the network: KnowledgeGraph already
+    # deduplicated them, and pyvis' add_node/add_edge re-check every existing
+    # entry on each call (quadratic - about 12 s at 5k nodes)
+    with span("graph.nodes"):
+        for node in graph.nodes.values():
+            score = pagerank_scores.get(node['id'], 0.1)
+            options = dict(
+                node_style(node, score),
+                id=node['id'],
+                shape="dot",
+                borderWidth=2,
+                font={'color': net.font_color},  # What pyvis' Node() ends up with
+            )
+            # Precomputed layouts pin every node so the browser never simulates
+            if node['id'] in positions:
+                x, y = positions[node['id']]
+                options.update(x=x, y=y, physics=False)
+            net.nodes.append(options)
+        net.node_ids = list(graph.nodes)
+        net.node_map = {options['id']: options for options in net.nodes}
         
-        # TOOLTIP FIX: "Relevance: 10%"
-        hover_text = f"{full_label}\nRelevance: {score:.0%}"
-        
-        net.add_node(
-            node['id'], 
-            label=wrapped_label, 
-            title=hover_text,
-            color=color, 
-            size=size,
-            shape="dot",
-            borderWidth=2,
-            font={'size': 14, 'face': 'sans-serif'}
-        )
-        added_node_ids.add(node['id'])
-    
-    # PYVIS FIX: Only add edge if both nodes were actually added to the graph
-    for edge in data['edges']:
-        if edge['source'] in added_node_ids and edge['target'] in added_node_ids:
-            net.add_edge(edge['source'], edge['target'], color="#cccccc")
+        drawn = set()
+        for (source, target), edge in graph.edges.items():
+            # Undirected network: A->B and B->A draw once, as pyvis' add_edge did
+            if (target, source) in drawn:
+                continue
+            drawn.add((source, target))
+            options = {'from': edge['source'], 'to': edge['target'], 'color': "#cccccc", 'width': min(edge['weight'], 5)}
+            if edge['label']:
+                options['title'] = edge['label']
+            net.edges.append(options)
     
     # --- PHYSICS FIX: FORCE SEPARATION ---
-    net.set_options("""
-    var options = {
-      "physics": {
-        "barnesHut": {
-          "gravitationalConstant": -30000,
-          "centralGravity": 0.3,
-          "springLength": 300,
-          "springConstant": 0.05,
-          "damping": 0.09,
-          "avoidOverlap": 1
+    if positions:
+        net.set_options("""
+        var options = {
+          "physics": {"enabled": false},
+          "edges": {"smooth": false}
         }
-      }
-    }
-    """)
+        """)
+    else:
+        net.set_options("var options = " + json.dumps({"physics": PHYSICS}))
     
     # --- STEP 3: INJECT CUSTOM JAVASCRIPT ---
     try:
-        html_string = net.generate_html()
+        with span("graph.html"):
+            html_string = net.generate_html()
+            if VIS_ASSETS == "in_line":
+                html_string = REMOTE_TAGS.sub("", html_string)  # Self-contained: no network requests at all
         
         fullscreen_code = """
         <style>
@@ -137,4 +184,105 @@ def visualize_knowledge_graph(data):
         return html_string
         
     except Exception as e:
-        return f"<div>Error generating graph: {e}</div>"
\ No newline at end of file
+        return f"<div>Error generating graph: {e}</div>"
+
+
+@traced("graph.render")
+def graph_payload(data, layout="auto", pagerank_scores=None):
+    """
+    The whole graph as a src.graph_view payload (the same rows as
+    LevelOfDetail.payload, nothing hidden), so the app draws every layout
+    with the locally served vis.js instead of a self-contained HTML page.
+    "physics" leaves x/y empty and lets the browser simulate with PHYSICS.
+    """
+    graph = KnowledgeGraph.from_data(data)
+    annotate(nodes=len(graph), edges=len(graph.edges))
+    if pagerank_scores is None:
+        with span("graph.pagerank"):
+            pagerank_scores = concept_importance(graph)
+
+    if layout == "auto":
+        layout = "force" if len(graph) > AUTO_STATIC_NODES else "physics"
+    annotate(layout=layout)
+    positions = {}
+    if layout != "physics":
+        with span("graph.layout", method=layout):
+            positions = canvas_positions(graph, graph_hash(data), layout)
+
+    nodes, edges = [], []
+    for node in graph.nodes.values():
+        style = node_style(node, pagerank_scores.get(node['id'], 0.1))
+        x, y = positions.get(node['id'], (None, None))
+        nodes.append([node['id'], style['label'], style['title'], style['color'], round(style['size'], 1),
+                      None if x is None else round(x), None if y is None else round(y), 0])
+    for (source, target), edge in graph.edges.items():
+        # A->B and B->A draw once, as in the standalone HTML
+        if (target, source) in graph.edges and target < source:
+            continue
+        edges.append([source, target, min(edge['weight'], 5), edge['label']])
+    return {"nodes": nodes, "edges": edges, "total": len(graph), "physics": None if positions else PHYSICS}
+
+class LevelOfDetail:
+    """
+    Level-of-detail view of a large graph. Only the `top_k` most important
+    concepts (and the edges among them) are sent at first; each click on a
+    node reveals its next `LOD_EXPAND` most important hidden neighbors.
+    Positions come from one precomputed layout of the whole graph, so
+    revealed nodes appear in place without moving the rest.
+
+    payload() is a compact JSON-ready dict for src.graph_view:
+        nodes: [id, label, tooltip, color, size, x, y, hidden neighbors]
+        edges: [source, target, width, label]
+    """
+
+    def __init__(self, data, pagerank_scores=None, layout="force"):
+        graph = KnowledgeGraph.from_data(data)
+        if pagerank_scores is None:
+            with span("graph.pagerank"):
+                pagerank_scores = concept_importance(graph)
+        with span("graph.layout", method=layout):
+            self.positions = canvas_positions(graph, graph_hash(data), layout)
+        self.graph = graph
+        self.scores = pagerank_scores
+
+        # Outgoing edges per node, and undirected neighbor lists ordered by importance
+        self.out_edges = {node_id: [] for node_id in graph.nodes}
+        self.neighbors = {node_id: set() for node_id in graph.nodes}
+        for (source, target), edge in graph.edges.items():
+            self.out_edges[source].append(edge)
+            self.neighbors[source].add(target)
+            self.neighbors[target].add(source)
+        importance = lambda node_id: -self.scores.get(node_id, 0)
+        self.ranked = sorted(graph.nodes, key=importance)
+        self.ranked_neighbors = {node_id: sorted(adjacent, key=importance)
+                                 for node_id, adjacent in self.neighbors.items()}
+
+    def __len__(self):
+        return len(self.graph)
+
+    def visible(self, top_k=LOD_TOP_K, expanded=None):
+        """
+        Ids shown for `expanded` ({node id: clicks}, in click order): the
+        top-k concepts plus each expanded node's most important neighbors.
+        """
+        shown = dict.fromkeys(self.ranked[:top_k])
+        for node_id, clicks in (expanded or {}).items():
+            if node_id in shown:
+                shown.update(dict.fromkeys(self.ranked_neighbors[node_id][:clicks * LOD_EXPAND]))
+        return shown
+
+    def payload(self, top_k=LOD_TOP_K, expanded=None):
+        shown = self.visible(top_k, expanded)
+        nodes, edges = [], []
+        for node_id in shown:
+            style = node_style(self.graph.nodes[node_id], self.scores.get(node_id, 0.1))
+            x, y = self.positions[node_id]
+            hidden = sum(1 for other in self.neighbors[node_id] if other not in shown)
+            nodes.append([node_id, style['label'], style['title'], style['color'],
+                          round(style['size'], 1), round(x), round(y), hidden])
+            # Edges among shown nodes only: cost follows the view, not the graph
+            for edge in self.out_edges[node_id]:
+                reverse = (edge['target'], node_id) in self.graph.edges
+                if edge['target'] in shown and not (reverse and edge['target'] < node_id):
+                    edges.append([node_id, edge['target'], min(edge['weight'], 5), edge['label']])
+        return {"nodes": nodes, "edges": edges, "total": len(self.graph)}
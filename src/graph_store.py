@@ -0,0 +1,200 @@
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from src.analytics import GraphAnalytics
+from src.chunking import normalize_label
+
+DEFAULT_STORE_PATH = os.getenv("VIDGRAPH_STORE", "vidgraph_library.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY,
+    video_key TEXT NOT NULL UNIQUE,
+    title TEXT,
+    ingested_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS concepts (
+    id INTEGER PRIMARY KEY,
+    norm_label TEXT NOT NULL UNIQUE,
+    label TEXT NOT NULL,
+    type TEXT NOT NULL DEFAULT 'sub',
+    pagerank REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_concepts_pagerank ON concepts(pagerank DESC);
+CREATE TABLE IF NOT EXISTS concept_videos (
+    concept_id INTEGER NOT NULL REFERENCES concepts(id),
+    video_id INTEGER NOT NULL REFERENCES videos(id),
+    PRIMARY KEY (concept_id, video_id)
+);
+CREATE INDEX IF NOT EXISTS idx_concept_videos_video ON concept_videos(video_id);
+CREATE TABLE IF NOT EXISTS edges (
+    video_id INTEGER NOT NULL REFERENCES videos(id),
+    source_id INTEGER NOT NULL REFERENCES concepts(id),
+    target_id INTEGER NOT NULL REFERENCES concepts(id),
+    label TEXT,
+    weight REAL NOT NULL DEFAULT 1,
+    PRIMARY KEY (video_id, source_id, target_id)
+);
+CREATE INDEX IF NOT EXISTS idx_edges_source ON edges(source_id);
+CREATE INDEX IF NOT EXISTS idx_edges_target ON edges(target_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class GraphStore:
+    """
+    Persistent, course-wide knowledge graph in SQLite.
+    Each video's graph is ingested once (re-ingesting replaces it); concepts
+    from different videos are merged on their normalized label, which is
+    indexed, so concept -> videos and neighbour lookups are index seeks.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.executescript(SCHEMA)
+            self._db.commit()
+
+    # --- WRITES ---
+    def ingest(self, video_key, graph_data, title=None):
+        """Adds (or replaces) one video's node/edge dict. Returns the number of concepts linked."""
+        with self._lock, self._db:
+            db = self._db
+            db.execute(
+                "INSERT INTO videos (video_key, title, ingested_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(video_key) DO UPDATE SET title = excluded.title, ingested_at = excluded.ingested_at",
+                (video_key, title, time.time()),
+            )
+            video_id = db.execute("SELECT id FROM videos WHERE video_key = ?", (video_key,)).fetchone()[0]
+            db.execute("DELETE FROM concept_videos WHERE video_id = ?", (video_id,))
+            db.execute("DELETE FROM edges WHERE video_id = ?", (video_id,))
+
+            concept_ids = {}
+            for node in graph_data.get('nodes', []):
+                label = node.get('label', node['id'])
+                norm = normalize_label(label)
+                if not norm:
+                    continue
+                node_type = 'core' if node.get('type') == 'core' else 'sub'
+                db.execute(
+                    "INSERT INTO concepts (norm_label, label, type) VALUES (?, ?, ?) "
+                    "ON CONFLICT(norm_label) DO UPDATE SET type = CASE WHEN excluded.type = 'core' "
+                    "THEN 'core' ELSE concepts.type END",
+                    (norm, label, node_type),
+                )
+                concept_id = db.execute("SELECT id FROM concepts WHERE norm_label = ?", (norm,)).fetchone()[0]
+                concept_ids[node['id']] = concept_id
+                db.execute("INSERT OR IGNORE INTO concept_videos (concept_id, video_id) VALUES (?, ?)",
+                           (concept_id, video_id))
+
+            for edge in graph_data.get('edges', []):
+                source = concept_ids.get(edge['source'])
+                target = concept_ids.get(edge['target'])
+                if source is None or target is None or source == target:
+                    continue
+                db.execute(
+                    "INSERT INTO edges (video_id, source_id, target_id, label, weight) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(video_id, source_id, target_id) DO UPDATE SET weight = edges.weight + excluded.weight",
+                    (video_id, source, target, edge.get('label'), edge.get('weight', 1.0)),
+                )
+
+            # Concepts only the replaced version of this video mentioned
+            db.execute("DELETE FROM concepts WHERE id NOT IN (SELECT concept_id FROM concept_videos)")
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('pagerank_dirty', '1')")
+        return len(set(concept_ids.values()))
+
+    # --- LOOKUPS ---
+    def videos_for(self, label):
+        """Videos mentioning a concept, most recent first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT v.video_key, v.title, v.ingested_at FROM concepts c "
+                "JOIN concept_videos cv ON cv.concept_id = c.id JOIN videos v ON v.id = cv.video_id "
+                "WHERE c.norm_label = ? ORDER BY v.ingested_at DESC",
+                (normalize_label(label),),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def neighbors(self, label, limit=25):
+        """Concepts directly linked to `label` in any video, strongest links first."""
+        with self._lock:
+            rows = self._db.execute(
+                """
+                SELECT n.label, n.type, MAX(e.label) AS relation, SUM(e.weight) AS weight, e.direction
+                FROM (
+                    SELECT target_id AS other_id, label, weight, 'out' AS direction FROM edges
+                    WHERE source_id = (SELECT id FROM concepts WHERE norm_label = :norm)
+                    UNION ALL
+                    SELECT source_id, label, weight, 'in' FROM edges
+                    WHERE target_id = (SELECT id FROM concepts WHERE norm_label = :norm)
+                ) e
+                JOIN concepts n ON n.id = e.other_id
+                GROUP BY n.id, e.direction
+                ORDER BY weight DESC
+                LIMIT :limit
+                """,
+                {"norm": normalize_label(label), "limit": limit},
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def search(self, prefix, limit=20):
+        """Concept labels starting with `prefix` (served by the norm_label index)."""
+        norm = normalize_label(prefix)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT label FROM concepts WHERE norm_label >= ? AND norm_label < ? ORDER BY pagerank DESC LIMIT ?",
+                (norm, norm + "\uffff", limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def top_concepts(self, k=20):
+        """Highest global-PageRank concepts across every ingested video."""
+        self.refresh_pagerank()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT c.label, c.type, c.pagerank, COUNT(cv.video_id) AS videos FROM concepts c "
+                "LEFT JOIN concept_videos cv ON cv.concept_id = c.id "
+                "GROUP BY c.id ORDER BY c.pagerank DESC LIMIT ?",
+                (k,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            return {
+                table: self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("videos", "concepts", "edges")
+            }
+
+    # --- GLOBAL PAGERANK ---
+    def refresh_pagerank(self, force=False):
+        """Recomputes global PageRank on the merged graph if anything was ingested since last time."""
+        with self._lock, self._db:
+            db = self._db
+            dirty = db.execute("SELECT value FROM meta WHERE key = 'pagerank_dirty'").fetchone()
+            if not force and (dirty is None or dirty[0] != '1'):
+                return
+
+            ids = np.array([row[0] for row in db.execute("SELECT id FROM concepts ORDER BY id")], dtype=np.int64)
+            edges = np.array(
+                db.execute("SELECT source_id, target_id, SUM(weight) FROM edges GROUP BY source_id, target_id").fetchall(),
+                dtype=float,
+            ).reshape(-1, 3)
+            position = np.searchsorted(ids, edges[:, :2].astype(np.int64))
+            previous = np.array([row[0] for row in db.execute("SELECT pagerank FROM concepts ORDER BY id")])
+            analytics = GraphAnalytics(len(ids), position[:, 0], position[:, 1], edges[:, 2])
+            # Scores from before the last ingest are a close starting point
+            scores = analytics.pagerank(x0=previous if previous.sum() > 0 else None)
+
+            db.executemany("UPDATE concepts SET pagerank = ? WHERE id = ?",
+                           zip(scores.tolist(), ids.tolist()))
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('pagerank_dirty', '0')")
@@ -0,0 +1,43 @@
+"""
+Streamlit component that draws every graph view in the app.
+
+The page (graph_view.html) and vis-network are served by Streamlit from one
+local directory, so nothing is fetched from a CDN and the ~500 KB of vis.js
+is downloaded once and cached by the browser instead of being embedded in
+every graph. Each rerun only sends a compact payload (LevelOfDetail.payload
+or graph_payload).
+"""
+import functools
+import os
+
+import pyvis
+import streamlit.components.v1 as components
+
+from src.components import install_component
+
+TEMPLATE = os.path.join(os.path.dirname(__file__), "graph_view.html")
+VIS_LIB = os.path.join(os.path.dirname(pyvis.__file__), "lib", "vis-9.1.2")
+FILES = {
+    "index.html": TEMPLATE,
+    "vis-network.min.js": os.path.join(VIS_LIB, "vis-network.min.js"),
+    "vis-network.css": os.path.join(VIS_LIB, "vis-network.css"),
+}
+
+
+@functools.lru_cache(maxsize=1)
+def component_dir():
+    """Directory the component is served from, assembled once per process."""
+    return install_component("graph_view", FILES)
+
+
+@functools.lru_cache(maxsize=1)
+def graph_component():
+    return components.declare_component("graph_view", path=component_dir())
+
+
+def graph_view(payload, height=600, key=None):
+    """
+    Draws a graph payload. Returns the latest click on a node with hidden
+    neighbors as {"expand": node id, "at": ms timestamp}, or None.
+    """
+    return graph_component()(payload=payload, height=height, key=key, default=None)
@@ -0,0 +1,92 @@
+from src.analytics import concept_importance
+from src.chunking import normalize_label
+from src.knowledge_graph import KnowledgeGraph
+from src.llm_engine import extract_graph_delta, extract_knowledge_graph
+
+CONTEXT_NODES = 200  # Existing concepts (by PageRank) described to the model on each update
+
+
+class IncrementalGraph:
+    """
+    Knowledge graph for a transcript that keeps growing (live captions).
+    Each update sends only the appended text plus a compact list of known
+    concepts, merges the returned delta, and warm-starts PageRank from the
+    previous scores, so cost per update scales with the new text.
+    """
+
+    def __init__(self, api_key, persona="Standard", transcript="", graph_data=None):
+        self.api_key = api_key
+        self.persona = persona
+        self.transcript = ""
+        self.graph = KnowledgeGraph()
+        self.pagerank = {}
+        self._by_label = {}  # normalized label -> node id
+        self.last_error = None
+        if graph_data is not None:
+            self.transcript = transcript
+            self._merge(graph_data)
+            self._update_pagerank()
+
+    def can_extend(self, transcript, persona=None):
+        """True if `transcript` is this one with text appended (and the persona is unchanged)."""
+        return (bool(self.transcript) and len(transcript) > len(self.transcript)
+                and transcript.startswith(self.transcript)
+                and (persona is None or persona == self.persona))
+
+    def update(self, transcript):
+        """
+        Brings the graph up to date with `transcript` and returns its node/edge dict.
+        Appended text goes through the delta path; anything else (first call,
+        edited text) falls back to a full extraction. On failure the previous
+        graph is kept and the error is left in `last_error`.
+        """
+        self.last_error = None
+        if transcript == self.transcript:
+            return self.graph_data()
+
+        extending = self.can_extend(transcript)
+        if extending:
+            known = sorted(self.graph.nodes.values(), key=lambda n: -self.pagerank.get(n['id'], 0))
+            result = extract_graph_delta(
+                transcript[len(self.transcript):], known[:CONTEXT_NODES], self.api_key, self.persona
+            )
+        else:
+            result = extract_knowledge_graph(transcript, self.api_key, self.persona)
+
+        if "error" in result:
+            self.last_error = result["error"]
+            return self.graph_data()
+
+        if not extending:
+            self.graph, self.pagerank, self._by_label = KnowledgeGraph(), {}, {}
+        self.transcript = transcript
+        self._merge(result)
+        self._update_pagerank()
+        return self.graph_data()
+
+    def graph_data(self):
+        return self.graph.to_dict()
+
+    def _merge(self, delta):
+        """Adds delta nodes (deduplicated by normalized label) and re-pointed edges."""
+        id_map = {}
+        for node in delta.get('nodes', []):
+            norm = normalize_label(node.get('label', node['id']))
+            existing_id = self._by_label.get(norm)
+            if existing_id is None and node['id'] in self.graph:
+                existing_id = node['id']
+            if existing_id is None:
+                self.graph.add_node(node)
+                self._by_label[norm] = existing_id = node['id']
+            else:
+                self.graph.add_node(dict(node, id=existing_id))  # Only upgrades the type
+            id_map[node['id']] = existing_id
+
+        for edge in delta.get('edges', []):
+            source = id_map.get(edge['source'], edge['source'])
+            target = id_map.get(edge['target'], edge['target'])
+            self.graph.add_edge(source, target, edge.get('label'), edge.get('weight', 1.0))
+
+    def _update_pagerank(self):
+        """PageRank warm-started from the previous scores; new nodes start at 1/N."""
+        self.pagerank = concept_importance(self.graph, previous=self.pagerank or None)
@@ -0,0 +1,428 @@
+"""
+Background jobs for the Visualize pipeline.
+
+A Visualize click submits a job instead of running the pipeline inside the
+Streamlit script, so reruns, widget clicks and reconnects no longer throw
+the work away. Jobs are keyed by the hash of the transcript (plus persona
+and mode): identical submissions, from any session, share one job and its
+results. Each stage's status, result and the summary streamed so far are
+written to the queue backend as they happen, for the UI to poll. The
+transcript is stored once, apart from the polled job, and each save only
+writes the fields that changed.
+
+Every runner records a heartbeat in the queue, and each job the runner that
+owns it. A queued or running job whose owner stopped beating (the process
+was restarted or killed) is stale: the next submission replaces it, and the
+UI resubmits it.
+
+    VIDGRAPH_JOBS=sqlite              jobs in .vidgraph_cache/jobs.sqlite3 (default)
+    VIDGRAPH_JOBS=sqlite:/path/to.db  ... or in another file
+    VIDGRAPH_JOBS=memory              this process only
+"""
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from src.cache import DEFAULT_CACHE_DIR
+from src.llm_engine import stream_summary
+from src.pipeline import PipelineRun, error_result
+from src.telemetry import annotate, propagate, span
+
+JOB_WORKERS = int(os.getenv("VIDGRAPH_JOB_WORKERS", "4"))  # Jobs run at once per process
+JOB_STALE_SECONDS = 300   # A job with no progress for this long is assumed dead and re-run
+RUNNER_HEARTBEAT = 5.0    # Seconds between a runner's heartbeats
+RUNNER_DEAD_AFTER = 30.0  # A runner silent for this long is assumed dead, and its jobs stale
+JOB_TTL = 24 * 3600       # Finished jobs are kept (and shared) this long
+PROGRESS_INTERVAL = 0.5   # Seconds between saves of the streaming summary
+
+FINISHED = ("done", "failed")
+PROGRESS_FIELDS = ("status", "owner", "stages", "results", "partial_summary", "error")  # What a save may change
+
+
+def job_key(transcript, persona="Standard", combined=False):
+    """Jobs with the same transcript, persona and mode are the same job."""
+    payload = json.dumps([transcript, persona, bool(combined)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def new_job(transcript, persona="Standard", combined=False):
+    """The job as the UI sees it; the transcript itself is stored separately (see enqueue)."""
+    now = time.time()
+    return {
+        "id": job_key(transcript, persona, combined),
+        "status": "queued",
+        "owner": None,
+        "persona": persona,
+        "combined": bool(combined),
+        "stages": {task: {"status": "queued", "started": None, "seconds": None}
+                   for task in ("graph", "quiz", "summary")},
+        "results": {},
+        "partial_summary": "",
+        "error": None,
+        "created": now,
+        "updated": now,
+    }
+
+
+def is_error(task, result):
+    """Matches the failure shapes of pipeline.error_result (and the engine functions) in PipelineRun results."""
+    if task == "graph":
+        return "error" in result
+    if task == "quiz":
+        return not result or "error" in result[0]
+    return result.startswith("Error generating summary")
+
+
+def reusable(job, now, owner_alive=True):
+    """An existing job a new submission can attach to: finished fine, or still making progress."""
+    if job["status"] == "done":
+        return now - job["updated"] < JOB_TTL
+    if job["status"] in ("queued", "running"):
+        return owner_alive and now - job["updated"] < JOB_STALE_SECONDS
+    return False
+
+
+# --- QUEUE BACKENDS ---
+class MemoryQueue:
+    """Jobs in a dict; shared by every session of this process."""
+
+    def __init__(self, max_jobs=256):
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._transcripts = {}
+        self._heartbeats = {}
+        self._lock = threading.Lock()
+
+    def beat(self, owner, now):
+        with self._lock:
+            self._heartbeats[owner] = now
+
+    def alive(self, owner, now):
+        with self._lock:
+            return self._alive(owner, now)
+
+    def _alive(self, owner, now):
+        return now - self._heartbeats.get(owner, float("-inf")) < RUNNER_DEAD_AFTER
+
+    def enqueue(self, job, transcript):
+        """Stores `job` unless a reusable one with its id exists. Returns (stored job, created)."""
+        now = time.time()
+        with self._lock:
+            existing = self._jobs.get(job["id"])
+            if existing is not None and reusable(existing, now, self._alive(existing.get("owner"), now)):
+                return copy.deepcopy(existing), False
+            self._jobs[job["id"]] = copy.deepcopy(job)
+            self._jobs.move_to_end(job["id"])
+            self._transcripts[job["id"]] = transcript
+            # Forget the oldest finished jobs (never ones still running)
+            for job_id in [i for i, j in self._jobs.items() if j["status"] in FINISHED]:
+                if len(self._jobs) <= self.max_jobs:
+                    break
+                del self._jobs[job_id]
+                del self._transcripts[job_id]
+            return copy.deepcopy(job), True
+
+    def claim(self, job_id, owner):
+        """Marks a queued job running under `owner`; returns it, or None if another worker got it first."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != "queued":
+                return None
+            job["status"], job["owner"] = "running", owner
+            job["updated"] = time.time()
+            return copy.deepcopy(job)
+
+    def update(self, job_id, fields):
+        """Writes `fields` (a few of PROGRESS_FIELDS) into the job and bumps its updated time."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(copy.deepcopy({f: v for f, v in fields.items() if f in PROGRESS_FIELDS}))
+                job["updated"] = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job is not None else None
+
+    def transcript(self, job_id):
+        with self._lock:
+            return self._transcripts.get(job_id)
+
+
+class SQLiteQueue:
+    """
+    Jobs as rows in SQLite. Results outlive the process, and several app
+    processes on one machine share (and deduplicate) the same jobs - a
+    local stand-in for a real broker. The progress fields have columns of
+    their own, so a save rewrites only what changed; transcripts live in
+    a separate table that the UI never reads.
+    """
+
+    JSON_FIELDS = ("stages", "results")
+
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
+            path = os.path.join(DEFAULT_CACHE_DIR, "jobs.sqlite3")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    owner TEXT,
+                    persona TEXT NOT NULL,
+                    combined INTEGER NOT NULL,
+                    stages TEXT NOT NULL,
+                    results TEXT NOT NULL,
+                    partial_summary TEXT NOT NULL,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            """)
+            self._db.execute("CREATE TABLE IF NOT EXISTS transcripts (id TEXT PRIMARY KEY, transcript TEXT NOT NULL)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS runners (owner TEXT PRIMARY KEY, heartbeat REAL NOT NULL)")
+
+    def beat(self, owner, now):
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO runners (owner, heartbeat) VALUES (?, ?)", (owner, now))
+
+    def alive(self, owner, now):
+        with self._lock:
+            return self._alive(owner, now)
+
+    def _alive(self, owner, now):
+        row = self._db.execute("SELECT heartbeat FROM runners WHERE owner = ?", (owner,)).fetchone()
+        return row is not None and now - row[0] < RUNNER_DEAD_AFTER
+
+    def _load(self, job_id):
+        cursor = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        job = dict(zip([c[0] for c in cursor.description], row))
+        for field in self.JSON_FIELDS:
+            job[field] = json.loads(job[field])
+        job["combined"] = bool(job["combined"])
+        return job
+
+    def _encode(self, field, value):
+        return json.dumps(value, ensure_ascii=False) if field in self.JSON_FIELDS else value
+
+    def enqueue(self, job, transcript):
+        now = time.time()
+        with self._lock, self._db:
+            existing = self._load(job["id"])
+            if existing is not None and reusable(existing, now, self._alive(existing["owner"], now)):
+                return existing, False
+            expired = "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND updated < ?"
+            self._db.execute(f"DELETE FROM transcripts WHERE id IN ({expired})", (now - JOB_TTL,))
+            self._db.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?", (now - JOB_TTL,))
+            self._db.execute("DELETE FROM runners WHERE heartbeat < ?", (now - JOB_TTL,))
+            fields = list(job)
+            self._db.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})",
+                [self._encode(field, job[field]) for field in fields],
+            )
+            self._db.execute("INSERT OR REPLACE INTO transcripts (id, transcript) VALUES (?, ?)", (job["id"], transcript))
+            return job, True
+
+    def claim(self, job_id, owner):
+        now = time.time()
+        with self._lock, self._db:
+            claimed = self._db.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, updated = ? WHERE id = ? AND status = 'queued'",
+                (owner, now, job_id),
+            ).rowcount
+            return self._load(job_id) if claimed else None
+
+    def update(self, job_id, fields):
+        """Writes `fields` (a few of PROGRESS_FIELDS) into the job's row and bumps its updated time."""
+        names = [field for field in fields if field in PROGRESS_FIELDS]
+        assignments = ", ".join(f"{field} = ?" for field in names + ["updated"])
+        values = [self._encode(field, fields[field]) for field in names]
+        with self._lock, self._db:
+            self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", values + [time.time(), job_id])
+
+    def get(self, job_id):
+        with self._lock:
+            return self._load(job_id)
+
+    def transcript(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT transcript FROM transcripts WHERE id = ?", (job_id,)).fetchone()
+            return row[0] if row is not None else None
+
+
+QUEUES = {"memory": MemoryQueue, "sqlite": SQLiteQueue}
+
+
+def queue_from_env(spec=None):
+    """Parses VIDGRAPH_JOBS ("memory", "sqlite" or "sqlite:path") into a queue backend."""
+    spec = os.getenv("VIDGRAPH_JOBS", "sqlite") if spec is None else spec
+    kind, _, target = spec.partition(":")
+    if kind not in QUEUES:
+        raise ValueError(f"Unknown job queue '{kind}' (choose from {', '.join(QUEUES)})")
+    return QUEUES[kind](target) if target else QUEUES[kind]()
+
+
+# --- RUNNER ---
+class JobRunner:
+    """
+    In-process executor over a queue backend. The API key only lives in
+    memory (it is never written to the queue); a job shared by several
+    sessions runs on the key of whoever submitted it first.
+    """
+
+    def __init__(self, queue, workers=JOB_WORKERS):
+        self.queue = queue
+        self.owner = uuid.uuid4().hex
+        self._stopped = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vidgraph-job")
+        self.queue.beat(self.owner, time.time())
+        threading.Thread(target=self._heartbeat, name="vidgraph-job-heartbeat", daemon=True).start()
+
+    def _heartbeat(self):
+        while not self._stopped.wait(RUNNER_HEARTBEAT):
+            try:
+                self.queue.beat(self.owner, time.time())
+            except sqlite3.Error:
+                pass  # Locked database etc.; the next beat is soon enough
+
+    def close(self, wait=True):
+        """
+        Stops the heartbeat and the worker threads. Jobs not started yet are
+        dropped; once the heartbeat is stale they are resubmitted like any
+        job of a dead runner.
+        """
+        self._stopped.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def submit(self, transcript, api_key, persona="Standard", combined=False):
+        """Returns the job for this transcript, starting it only if no usable one exists."""
+        job = new_job(transcript, persona, combined)
+        job["owner"] = self.owner
+        job, created = self.queue.enqueue(job, transcript)
+        if created:
+            self._executor.submit(self._run, job["id"], api_key)
+        return job
+
+    def get(self, job_id):
+        return self.queue.get(job_id)
+
+    def is_stale(self, job):
+        """True for a queued or running job nobody is working on any more (its runner died)."""
+        if job["status"] in FINISHED:
+            return False
+        now = time.time()
+        return not reusable(job, now, self.queue.alive(job.get("owner"), now))
+
+    def _run(self, job_id, api_key):
+        job = self.queue.claim(job_id, self.owner)
+        if job is None:
+            return
+        lock = threading.Lock()  # The summary stream and the other stages write the same job
+        with span("job.run", combined=job["combined"]):
+            try:
+                self._execute(job, api_key, lock)
+            except Exception as e:
+                job["error"] = str(e)
+            with lock:
+                # Every stage ends with a result, even if the run itself blew up
+                for task, stage in job["stages"].items():
+                    if task not in job["results"]:
+                        job["results"][task] = error_result(task, job["error"] or "no result")
+                        stage["status"] = "error"
+                failed = any(stage["status"] == "error" for stage in job["stages"].values())
+                job["status"] = "failed" if failed else "done"
+                annotate(status=job["status"])
+                self._save(job, "status", "stages", "results", "error")
+
+    def _execute(self, job, api_key, lock):
+        transcript, persona = self.queue.transcript(job["id"]), job["persona"]
+        if transcript is None:
+            raise LookupError("the job's transcript is gone")
+        with lock:
+            for stage in job["stages"].values():
+                stage["status"], stage["started"] = "running", time.time()
+            self._save(job, "stages")
+
+        if job["combined"]:
+            # One structured request for all three stages
+            run = PipelineRun(transcript, api_key, persona, combined=True)
+            summary = None
+        else:
+            # Graph and quiz run on the pipeline's pool while the summary streams here
+            run = PipelineRun(transcript, api_key, persona, tasks=("graph", "quiz"))
+            summary = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vidgraph-job-summary")
+            summary.submit(propagate(self._stream_summary), job, transcript, api_key, lock)
+        try:
+            for task, result in run.results():
+                self._finish_stage(job, lock, task, result)
+        finally:
+            if summary is not None:
+                summary.shutdown(wait=True)
+
+    def _stream_summary(self, job, transcript, api_key, lock):
+        parts, saved = [], time.monotonic()
+        try:
+            for text in stream_summary(transcript, api_key, job["persona"]):
+                parts.append(text)
+                if time.monotonic() - saved >= PROGRESS_INTERVAL:
+                    with lock:
+                        job["partial_summary"] = "".join(parts)
+                        self._save(job, "partial_summary")
+                    saved = time.monotonic()
+        except Exception as e:
+            # The stream broke off: failed, however much text had arrived
+            self._finish_stage(job, lock, "summary", error_result("summary", str(e)), failed=True)
+            return
+        self._finish_stage(job, lock, "summary", "".join(parts).strip(), failed=False)
+
+    def _finish_stage(self, job, lock, task, result, failed=None):
+        """Records a stage's result; `failed` defaults to recognising the pipeline's error values."""
+        if failed is None:
+            failed = is_error(task, result)
+        with lock:
+            stage = job["stages"][task]
+            stage["status"] = "error" if failed else "done"
+            stage["seconds"] = round(time.time() - stage["started"], 2)
+            job["results"][task] = result
+            self._save(job, "stages", "results")
+
+    def _save(self, job, *fields):
+        """Writes only the named fields of `job` to the queue."""
+        self.queue.update(job["id"], {field: job[field] for field in fields})
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_runner():
+    """Process-wide job runner, on the queue named by $VIDGRAPH_JOBS."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            try:
+                queue = queue_from_env()
+            except (OSError, sqlite3.Error):
+                queue = MemoryQueue()  # Read-only filesystem etc.
+            _runner = JobRunner(queue)
+        return _runner
+
+
+def set_runner(runner):
+    global _runner
+    with _runner_lock:
+        _runner = runner
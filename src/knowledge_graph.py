@@ -0,0 +1,108 @@
+import hashlib
+import json
+
+import networkx as nx
+
+from src.analytics import GraphAnalytics
+
+
+def graph_hash(data):
+    """Stable content hash of a node/edge dict (independent of key order)."""
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class KnowledgeGraph:
+    """
+    Indexed form of the {"nodes": [...], "edges": [...]} dict the LLM returns.
+    Nodes are keyed by id once, so edge validation is a dict lookup;
+    parallel edges collapse into one edge that keeps every label and a
+    weight equal to how many times the relationship was stated.
+    """
+
+    def __init__(self):
+        self.nodes = {}   # id -> node dict, in insertion order
+        self.edges = {}   # (source, target) -> edge dict
+        self._nx = {}     # directed flag -> cached NetworkX graph
+        self._analytics = {}  # directed flag -> cached GraphAnalytics (CSR)
+
+    @classmethod
+    def from_data(cls, data):
+        graph = cls()
+        for node in data.get('nodes', []):
+            graph.add_node(node)
+        for edge in data.get('edges', []):
+            graph.add_edge(edge['source'], edge['target'], edge.get('label'), edge.get('weight', 1.0))
+        return graph
+
+    def add_node(self, node):
+        """Adds a node dict; a repeated id only upgrades the type to "core"."""
+        existing = self.nodes.get(node['id'])
+        if existing is None:
+            self.nodes[node['id']] = dict(node, label=node.get('label', node['id']))
+        elif node.get('type') == 'core':
+            existing['type'] = 'core'
+        self._nx.clear()
+        self._analytics.clear()
+
+    def add_edge(self, source, target, label=None, weight=1.0):
+        """
+        Adds a relationship between two known nodes.
+        Returns False (and adds nothing) if either end is unknown - the LLM
+        sometimes hallucinates edges to concepts it never listed.
+        """
+        if source not in self.nodes or target not in self.nodes or source == target:
+            return False
+        edge = self.edges.get((source, target))
+        if edge is None:
+            self.edges[(source, target)] = {
+                "source": source,
+                "target": target,
+                "label": label or "",
+                "labels": [label] if label else [],
+                "weight": float(weight),
+            }
+        else:
+            edge['weight'] += float(weight)
+            if label and label not in edge['labels']:
+                edge['labels'].append(label)
+                edge['label'] = ", ".join(edge['labels'])
+        self._nx.clear()
+        self._analytics.clear()
+        return True
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node_id):
+        return node_id in self.nodes
+
+    def to_networkx(self, directed=False):
+        """NetworkX view for analytics (built once, rebuilt only after changes)."""
+        if directed not in self._nx:
+            graph = nx.DiGraph() if directed else nx.Graph()
+            graph.add_nodes_from((node_id, node) for node_id, node in self.nodes.items())
+            for (source, target), edge in self.edges.items():
+                if graph.has_edge(source, target):
+                    # A->B and B->A fold together in the undirected view
+                    graph[source][target]['weight'] += edge['weight']
+                else:
+                    graph.add_edge(source, target, label=edge['label'], weight=edge['weight'])
+            self._nx[directed] = graph
+        return self._nx[directed]
+
+    def analytics(self, directed=True):
+        """CSR-backed centrality engine (built once, rebuilt only after changes)."""
+        if directed not in self._analytics:
+            self._analytics[directed] = GraphAnalytics.from_knowledge_graph(self, directed)
+        return self._analytics[directed]
+
+    def to_dict(self):
+        """Back to the plain node/edge dict format, with weights."""
+        return {
+            "nodes": list(self.nodes.values()),
+            "edges": [
+                {"source": e['source'], "target": e['target'], "label": e['label'], "weight": e['weight']}
+                for e in self.edges.values()
+            ],
+        }
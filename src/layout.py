@@ -0,0 +1,219 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import networkx as nx
+
+AUTO_STATIC_NODES = 150   # "auto" layout precomputes positions above this many nodes
+LAYOUT_CACHE_SIZE = 64
+REPULSION_BLOCK = 1024    # Rows per block in the all-pairs repulsion step
+EXACT_MAX_NODES = 500     # Above this, far-field repulsion comes from grid-cell centroids
+GRID_MAX_LEVEL = 16       # Deepest grid of the repulsion hierarchy: 2^16 cells per side
+NEAR_MAX_NODES = 64       # A node stops refining once its 3x3 cell neighbourhood holds this few
+DENSE_GRID_CELLS = 2 ** 20  # Grids up to this many cells are indexed with a flat array
+KAMADA_KAWAI_MAX_NODES = 200  # Above this, "kamada_kawai" falls back to force_layout
+
+
+def push(x, y, sources_x, sources_y, k, mass=None):
+    """Repulsion on every (x, y) from every source (optionally mass-weighted), in row blocks."""
+    disp = np.zeros((len(x), 2))
+    for start in range(0, len(x), REPULSION_BLOCK):
+        rows = slice(start, start + REPULSION_BLOCK)
+        dx = x[rows, None] - sources_x[None, :]
+        dy = y[rows, None] - sources_y[None, :]
+        strength = (k * k) / np.maximum(dx * dx + dy * dy, 1e-6)
+        if mass is not None:
+            strength *= mass
+        disp[rows, 0] = (dx * strength).sum(axis=1)
+        disp[rows, 1] = (dy * strength).sum(axis=1)
+    return disp
+
+
+def neighbour_offsets():
+    """
+    Per parity of a node's cell, the cells (relative to it) a level adds:
+    27 far cells - children of the parent's 3x3 neighbourhood outside the
+    node's own - followed by the node's own 3x3 neighbourhood.
+    """
+    near = [(ox, oy) for ox in (-1, 0, 1) for oy in (-1, 0, 1)]
+    table = []
+    for rx in (0, 1):
+        for ry in (0, 1):
+            far = [(ox, oy) for ox in range(-2 - rx, 4 - rx) for oy in range(-2 - ry, 4 - ry)
+                   if abs(ox) > 1 or abs(oy) > 1]
+            table.append(far + near)
+    return np.array(table)
+
+
+NEIGHBOURS = neighbour_offsets()
+FAR = 27
+PAD = 4  # Empty cells around the grid (even, to keep parities), so every neighbour exists
+
+
+def repulsion(pos, k):
+    """
+    Fruchterman-Reingold repulsion (k^2 / d along the separating vector).
+    Small graphs use exact all-pairs forces in row blocks, so memory stays
+    O(block * N). Larger graphs use a Barnes-Hut style grid hierarchy: at
+    each level a node feels the centroids of the cells next to (but not
+    touching) its parent's neighbourhood, and it descends until its own 3x3
+    neighbourhood holds at most NEAR_MAX_NODES nodes, which then repel it
+    exactly. Close nodes therefore still push apart, and only dense regions
+    pay for deep levels.
+    """
+    n = len(pos)
+    x, y = pos[:, 0], pos[:, 1]
+    if n <= EXACT_MAX_NODES:
+        return push(x, y, x, y, k)
+
+    low = pos.min(axis=0)
+    unit = (pos - low) / max(float((pos.max(axis=0) - low).max()), 1e-9) * (1 - 1e-9)  # [0, 1)
+    disp = np.zeros((n, 2))
+    active = np.arange(n)
+    for level in range(2, GRID_MAX_LEVEL + 1):
+        width = 2 ** level + 2 * PAD
+        cell_xy = (unit * 2 ** level).astype(np.int64) + PAD
+        cell = cell_xy[:, 0] * width + cell_xy[:, 1]
+        # Only occupied cells are indexed; slot -1 (missing) reads the trailing zeros
+        cells, members, counts = np.unique(cell, return_inverse=True, return_counts=True)
+        centroid_x = np.append(np.bincount(members, weights=x) / counts, 0.0)
+        centroid_y = np.append(np.bincount(members, weights=y) / counts, 0.0)
+        counts = np.append(counts, 0)
+
+        parity = (cell_xy[active, 0] % 2) * 2 + cell_xy[active, 1] % 2
+        offsets = NEIGHBOURS[:, :, 0] * width + NEIGHBOURS[:, :, 1]
+        q = lookup(cells, cell[active, None] + offsets[parity], width * width)
+
+        # Far field: centroids of the cells this level adds (in place, it is the hot loop)
+        far = np.ascontiguousarray(q[:, :FAR])
+        dx = np.subtract(x[active, None], centroid_x[far])
+        dy = np.subtract(y[active, None], centroid_y[far])
+        strength = np.maximum(dx * dx + np.square(dy, out=np.empty_like(dy)), 1e-6)
+        np.divide(counts[far], strength, out=strength)
+        disp[active, 0] += (k * k) * np.einsum("ij,ij->i", dx, strength)
+        disp[active, 1] += (k * k) * np.einsum("ij,ij->i", dy, strength)
+
+        # Near field: nodes with few enough neighbours stop here and take them exactly
+        near = q[:, FAR:]
+        done = (counts[near].sum(axis=1) <= NEAR_MAX_NODES) | (level == GRID_MAX_LEVEL)
+        disp += near_field(x, y, k, active[done], near[done], members, counts)
+        active = active[~done]
+        if not len(active):
+            break
+    return disp
+
+
+def lookup(cells, ids, grid_cells):
+    """Index of each of `ids` in the sorted occupied `cells`, or -1 where the cell is empty."""
+    if grid_cells <= DENSE_GRID_CELLS:
+        slots = np.full(grid_cells, -1)
+        slots[cells] = np.arange(len(cells))
+        return slots[ids]
+    q = np.minimum(np.searchsorted(cells, ids), len(cells) - 1)
+    return np.where(cells[q] == ids, q, -1)
+
+
+def near_field(x, y, k, rows, q, members, counts):
+    """Exact repulsion on each of `rows` from every other node in its cells `q` (-1: none)."""
+    disp = np.zeros((len(x), 2))
+    order = np.argsort(members, kind="stable")  # Nodes grouped by cell, in cell order
+    starts = np.cumsum(counts) - counts
+    found = q >= 0
+    rows = np.broadcast_to(rows[:, None], q.shape)[found]
+    q = q[found]
+    take = counts[q]
+    within = np.arange(take.sum()) - np.repeat(np.cumsum(take) - take, take)
+    i = np.repeat(rows, take)
+    j = order[np.repeat(starts[q], take) + within]
+    i, j = i[i != j], j[i != j]
+    dx, dy = x[i] - x[j], y[i] - y[j]
+    strength = (k * k) / np.maximum(dx * dx + dy * dy, 1e-6)
+    disp[:, 0] = np.bincount(i, weights=dx * strength, minlength=len(x))
+    disp[:, 1] = np.bincount(i, weights=dy * strength, minlength=len(x))
+    return disp
+
+
+def force_layout(graph, iterations=60, seed=0):
+    """
+    Vectorised Fruchterman-Reingold layout in NumPy.
+    Attraction runs over the edge arrays in one shot; see repulsion() for
+    how the all-pairs term is kept tractable. Returns {id: (x, y)} in [-1, 1].
+    """
+    ids = list(graph.nodes)
+    n = len(ids)
+    if n <= 1:
+        return {node_id: (0.0, 0.0) for node_id in ids}
+
+    index = {node_id: i for i, node_id in enumerate(ids)}
+    edges = list(graph.edges.values())
+    src = np.array([index[e['source']] for e in edges], dtype=np.intp)
+    dst = np.array([index[e['target']] for e in edges], dtype=np.intp)
+    weight = np.array([e['weight'] for e in edges], dtype=float)
+
+    pos = np.random.default_rng(seed).random((n, 2))
+    k = np.sqrt(1.0 / n)
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+
+    for _ in range(iterations):
+        disp = repulsion(pos, k)
+
+        # Attraction along edges: d^2 / k, scaled by edge weight
+        if len(edges):
+            delta = pos[src] - pos[dst]
+            dist = np.maximum(np.linalg.norm(delta, axis=1), 1e-3)
+            force = delta * (dist * weight / k)[:, None]
+            np.add.at(disp, src, -force)
+            np.add.at(disp, dst, force)
+
+        # Move each node at most `temperature`, cooling every step
+        length = np.maximum(np.linalg.norm(disp, axis=1), 1e-9)
+        pos += disp * (np.minimum(length, temperature) / length)[:, None]
+        temperature -= cooling
+
+    pos -= pos.mean(axis=0)
+    pos /= np.abs(pos).max() or 1.0
+    return {node_id: (float(x), float(y)) for node_id, (x, y) in zip(ids, pos)}
+
+
+def spring_layout(graph, seed=0):
+    return nx.spring_layout(graph.to_networkx(), weight='weight', seed=seed)
+
+
+def kamada_kawai_layout(graph):
+    """Kamada-Kawai is O(N^2) per step (10s at 500 nodes); larger graphs get the force layout."""
+    if len(graph) > KAMADA_KAWAI_MAX_NODES:
+        return force_layout(graph)
+    return nx.kamada_kawai_layout(graph.to_networkx())
+
+
+LAYOUTS = {
+    "force": force_layout,
+    "spring": spring_layout,
+    "kamada_kawai": kamada_kawai_layout,
+}
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def canvas_positions(graph, graph_key, method="force"):
+    """
+    Node positions in vis.js canvas units, cached per (graph hash, method).
+    The canvas grows with sqrt(N) so large graphs keep roughly constant density.
+    """
+    cache_key = (graph_key, method)
+    with _cache_lock:
+        if cache_key in _cache:
+            _cache.move_to_end(cache_key)
+            return _cache[cache_key]
+
+    unit = LAYOUTS[method](graph)
+    spread = max(400.0, 80.0 * np.sqrt(len(graph)))
+    positions = {node_id: (x * spread, y * spread) for node_id, (x, y) in unit.items()}
+
+    with _cache_lock:
+        _cache[cache_key] = positions
+        while len(_cache) > LAYOUT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return positions
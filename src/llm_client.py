@@ -0,0 +1,192 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+from src.rate_limit import RateLimiter
+from src.telemetry import count, record_tokens, span
+
+# HTTP statuses worth retrying: quota (429) and transient server errors
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling Gemini while the circuit breaker is open."""
+
+
+def is_retryable(error):
+    """True for rate-limit and transient errors; bad requests and auth errors are not retried."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None)  # google.api_core exceptions carry the HTTP status
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS
+    return type(error).__name__ in ("ResourceExhausted", "ServiceUnavailable", "InternalServerError",
+                                    "DeadlineExceeded", "TooManyRequests")
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failed requests (a request
+    fails once its retries are used up) and then fails fast for
+    `reset_timeout` seconds. After that a single trial call is
+    let through (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.reset_timeout - (self._clock() - self._opened_at)
+            if remaining > 0 or self._trial_running:
+                raise CircuitOpenError(f"Gemini temporarily unavailable; retrying in {max(remaining, 0):.0f}s")
+            self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution and its result."""
+
+    def __init__(self):
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return future.result()
+
+
+class LLMClient:
+    """
+    Shared wrapper around model.generate_content: token-bucket rate limiting,
+    exponential backoff with jitter on retryable errors, a circuit breaker, and
+    single-flight coalescing of identical non-streaming requests. `model` can be
+    anything with a generate_content method, so a local fake works for tests.
+    """
+
+    def __init__(self, limiter=None, breaker=None, max_retries=4, base_delay=1.0, max_delay=30.0,
+                 sleep=time.sleep, rng=random.random):
+        self.limiter = limiter or RateLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._rng = rng
+        self._flights = SingleFlight()
+
+    def call(self, model, prompt, api_key=None, **kwargs):
+        """`api_key` is only used to keep requests made with different keys apart."""
+        if kwargs.get("stream"):
+            # A stream can only be consumed once, so it is never shared
+            return self._call_with_retries(model, prompt, kwargs)
+        key = request_key(model, prompt, kwargs, api_key)
+        with span("gemini.call", model=getattr(model, "model_name", None)):
+            return self._flights.do(key, lambda: self._call_with_retries(model, prompt, kwargs))
+
+    def backoff(self, attempt):
+        """Delay before retry number `attempt` (0-based): capped exponential with equal jitter."""
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay / 2 + self._rng() * delay / 2
+
+    def _call_with_retries(self, model, prompt, kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.breaker.before_call()
+            waited = time.perf_counter()
+            self.limiter.acquire(prompt)
+            waited = time.perf_counter() - waited
+            if waited > 0.001:
+                count("rate_limited_ms", round(waited * 1000, 1))
+            try:
+                response = model.generate_content(prompt, **kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.record_success()  # The service answered; the request was bad
+                    raise
+                # One failure per request, not per attempt, so a single
+                # request's retries can't open the shared breaker on their own.
+                # A failed half-open trial re-opens it straight away.
+                if attempt == self.max_retries or self.breaker.is_open:
+                    self.breaker.record_failure()
+                    raise
+                count("retries")
+                self._sleep(self.backoff(attempt))
+                continue
+            self.breaker.record_success()
+            if not kwargs.get("stream"):
+                record_tokens(response)  # Streams only know their usage once consumed
+            return response
+
+
+def request_key(model, prompt, kwargs, api_key=None):
+    """Identity of a request for coalescing: API key (hashed), model, prompt and generation options."""
+    key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest() if api_key else None
+    payload = json.dumps([key_hash, getattr(model, "model_name", repr(model)), prompt,
+                          repr(sorted(kwargs.items()))])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+_client = LLMClient()
+
+
+def get_client():
+    return _client
+
+
+def set_client(client):
+    """Replaces the process-wide client (e.g. with custom retry settings)."""
+    global _client
+    _client = client
+
+
+def set_rate_limiter(limiter):
+    """Installs a process-wide RateLimiter applied to every Gemini request."""
+    _client.limiter = limiter
+
+
+def call_model(model, prompt, api_key=None, **kwargs):
+    """Single choke point for Gemini requests."""
+    return _client.call(model, prompt, api_key, **kwargs)
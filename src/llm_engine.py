@@ -1,17 +1,102 @@
-import json
-import google.generativeai as genai
+import os
+import threading
+import time
 import re
 
+from concurrent.futures import ThreadPoolExecutor
+
+from src.backends import DEFAULT_MODEL, backend_from_env
+from src.cache import get_cache, make_key
+from src.chunking import MAX_CHARS, iter_chunks, merge_graphs
+from src.llm_json import VALIDATORS, parse_json, repair_prompt
+from src.llm_client import call_model
+from src.telemetry import annotate, propagate, record_tokens, span, traced
+
+# Bump a task's version whenever its prompt changes so stale cache entries are skipped
+PROMPT_VERSIONS = {
+    "graph": 2,
+    "quiz": 1,
+    "summary": 2,
+}
+
+CHUNK_WORKERS = 4  # Concurrent Gemini calls when a long transcript is split
+
+def cache_key(transcript, persona, task, model_name):
+    """Cache key for one task's output on this transcript."""
+    return make_key(transcript, persona, task, model_name, PROMPT_VERSIONS[task])
+
+# --- MODEL REGISTRY ---
+MODEL_TTL = 3600  # Seconds before model discovery runs again
+
+_registry_lock = threading.RLock()
+_backend = None  # Where models come from (src.backends), chosen on first use
+_model_override = None
+_resolved_model = None  # (model name, resolved at)
+_configured_key = None
+_models = {}  # (api key, model name) -> GenerativeModel
+
+def get_backend():
+    """The model backend in use ($VIDGRAPH_BACKEND unless set_backend was called)."""
+    global _backend
+    with _registry_lock:
+        if _backend is None:
+            _backend = backend_from_env()
+        return _backend
+
+def set_backend(backend):
+    """Swaps the model backend (e.g. a FakeBackend for offline runs) and drops cached models."""
+    global _backend, _resolved_model, _configured_key
+    with _registry_lock:
+        _backend = backend
+        _resolved_model = None
+        _configured_key = None
+        _models.clear()
+
+def set_model_override(model_name):
+    """Pins the model name, skipping discovery (None restores auto-discovery)."""
+    global _model_override, _resolved_model
+    with _registry_lock:
+        _model_override = model_name
+        _resolved_model = None
+
+def configure(api_key):
+    """Configures the backend, only when the key actually changes."""
+    global _configured_key, _resolved_model
+    with _registry_lock:
+        if api_key != _configured_key:
+            get_backend().configure(api_key)
+            _configured_key = api_key
+            _resolved_model = None  # A new key may see a different model list
+
 def get_available_model():
-    """Finds a valid Gemini model automatically."""
-    try:
-        for m in genai.list_models():
-            if 'generateContent' in m.supported_generation_methods:
-                if 'flash' in m.name: return m.name
-                if 'pro' in m.name and '1.5' in m.name: return m.name
-        return "models/gemini-1.5-flash"
-    except:
-        return "models/gemini-1.5-flash"
+    """Finds a valid Gemini model automatically (resolved once per MODEL_TTL)."""
+    global _resolved_model
+    override = _model_override or os.getenv("VIDGRAPH_MODEL")
+    if override:
+        return override
+
+    with _registry_lock:
+        if _resolved_model and time.monotonic() - _resolved_model[1] < MODEL_TTL:
+            return _resolved_model[0]
+        try:
+            with span("model.discover"):
+                name = get_backend().discover_model()
+            _resolved_model = (name, time.monotonic())
+            return name
+        except:
+            # Don't remember the fallback; try discovery again next call
+            return DEFAULT_MODEL
+
+def get_model(api_key):
+    """Returns the shared GenerativeModel for this key, creating it on first use."""
+    with _registry_lock:
+        configure(api_key)
+        model_name = get_available_model()
+        model = _models.get((api_key, model_name))
+        if model is None:
+            model = get_backend().create_model(model_name)
+            _models[(api_key, model_name)] = model
+        return model
 
 def get_persona_instruction(persona):
     """Returns the system instruction based on the selected persona."""
@@ -22,55 +107,156 @@ def get_persona_instruction(persona):
     else: # Standard
         return "Be clear, concise, and professional."
 
+def map_chunks(fn, chunks):
+    """
+    Runs fn over every chunk in parallel, keeping chunk order.
+    One failed chunk fails the call: a graph or summary missing a section
+    must not be returned (and cached) as if it were complete.
+    """
+    with ThreadPoolExecutor(max_workers=min(CHUNK_WORKERS, len(chunks))) as pool:
+        try:
+            return list(pool.map(propagate(fn), chunks))
+        except Exception:
+            pool.shutdown(cancel_futures=True)  # Don't spend requests on chunks whose result is lost anyway
+            raise
+
+def extract_graph_chunk(model, text, style, api_key=None):
+    """Runs the graph prompt on one chunk of transcript."""
+    prompt = f"""
+    You are a Knowledge Graph creator. 
+    Style Requirement: {style}
+    
+    Analyze the text and identify:
+    1. "Core Concepts" (The main 3-5 topics).
+    2. "Sub Concepts" (The details supporting them).
+    3. "Relationships" (Connect concepts logically).
+    
+    CRITICAL RULE: Ensure the graph is INTERCONNECTED. 
+    - Find connections between different Core Concepts.
+    - Find connections between Sub Concepts of different parents.
+    - Do not create isolated clusters.
+    
+    Transcript: 
+    {text} 
+
+    Output STRICTLY JSON (no markdown):
+    {{
+      "nodes": [
+         {{"id": "Concept A", "label": "Concept A", "type": "core"}},
+         {{"id": "Concept B", "label": "Concept B", "type": "sub"}}
+      ],
+      "edges": [
+         {{"source": "Concept A", "target": "Concept B", "label": "includes"}},
+         {{"source": "Concept B", "target": "Concept C", "label": "relates to"}}
+      ]
+    }}
+    """
+    response = call_model(model, prompt, api_key=api_key)
+    return parse_or_repair(model, response.text, "graph", api_key)
+
+@traced("llm.graph")
 def extract_knowledge_graph(transcript, api_key, persona="Standard"):
-    """Generates the Knowledge Graph with Node Importance."""
+    """
+    Generates the Knowledge Graph with Node Importance.
+    Long transcripts are split into overlapping chunks, a partial graph is
+    extracted per chunk in parallel, and the partials are merged by concept.
+    """
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(get_available_model())
+        model = get_model(api_key)
+        key = cache_key(transcript, persona, "graph", model.model_name)
+        cached = get_cache().get(key)
+        if cached is not None:
+            annotate(cache="hit")
+            return cached
         
         style = get_persona_instruction(persona)
-        
-        prompt = f"""
-        You are a Knowledge Graph creator. 
-        Style Requirement: {style}
-        
-        Analyze the text and identify:
-        1. "Core Concepts" (The main 3-5 topics).
-        2. "Sub Concepts" (The details supporting them).
-        3. "Relationships" (Connect concepts logically).
-        
-        CRITICAL RULE: Ensure the graph is INTERCONNECTED. 
-        - Find connections between different Core Concepts.
-        - Find connections between Sub Concepts of different parents.
-        - Do not create isolated clusters.
-        
-        Transcript: 
-        {transcript[:30000]} 
-
-        Output STRICTLY JSON (no markdown):
-        {{
-          "nodes": [
-             {{"id": "Concept A", "label": "Concept A", "type": "core"}},
-             {{"id": "Concept B", "label": "Concept B", "type": "sub"}}
-          ],
-          "edges": [
-             {{"source": "Concept A", "target": "Concept B", "label": "includes"}},
-             {{"source": "Concept B", "target": "Concept C", "label": "relates to"}}
-          ]
-        }}
-        """
-        response = model.generate_content(prompt)
-        clean_text = response.text.replace("```json", "").replace("```", "").strip()
-        return json.loads(clean_text)
+        chunks = list(iter_chunks(transcript))
+        annotate(cache="miss", chunks=len(chunks))
+        partials = map_chunks(lambda chunk: extract_graph_chunk(model, chunk, style, api_key), chunks)
+        data = partials[0] if len(partials) == 1 else merge_graphs(partials)
+        get_cache().set(key, data)
+        return data
 
     except Exception as e:
+        annotate(error=str(e))
         return {"error": f"Graph Error: {str(e)}"}
 
+@traced("llm.graph_delta")
+def extract_graph_delta(new_text, known_nodes, api_key, persona="Standard"):
+    """
+    Incremental extraction for a growing transcript: only the newly appended
+    text is sent, together with a compact "id | label" list of concepts the
+    graph already has. Returns just the new nodes and edges (edges may point
+    at existing ids), or an error dict like extract_knowledge_graph.
+    """
+    try:
+        model = get_model(api_key)
+        style = get_persona_instruction(persona)
+        known = "\n".join(f"{node['id']} | {node['label']}" for node in known_nodes)
+
+        def extract(chunk):
+            prompt = f"""
+            You are extending an existing Knowledge Graph with newly transcribed text.
+            Style Requirement: {style}
+            
+            Concepts already in the graph (id | label):
+            {known or "(none yet)"}
+            
+            New transcript text:
+            {chunk}
+            
+            Return ONLY what the new text adds:
+            - New concepts as nodes ("core" for major topics, "sub" for details).
+              Do NOT repeat concepts that are already listed.
+            - New relationships as edges. Edges may connect new concepts to each
+              other or to existing ones - refer to existing concepts by their id.
+            
+            Output STRICTLY JSON (no markdown):
+            {{"nodes": [{{"id": "...", "label": "...", "type": "sub"}}],
+              "edges": [{{"source": "...", "target": "...", "label": "..."}}]}}
+            """
+            response = call_model(model, prompt, api_key=api_key)
+            return parse_or_repair(model, response.text, "graph_delta", api_key)
+
+        partials = map_chunks(extract, list(iter_chunks(new_text)))
+        return partials[0] if len(partials) == 1 else {
+            "nodes": [node for part in partials for node in part['nodes']],
+            "edges": [edge for part in partials for edge in part['edges']],
+        }
+
+    except Exception as e:
+        annotate(error=str(e))
+        return {"error": f"Graph Error: {str(e)}"}
+
+def parse_or_repair(model, raw_text, task, api_key=None):
+    """
+    Parses and validates model JSON for a task ("graph", "graph_delta" or "quiz").
+    If that fails, only the broken output is sent back with a short repair
+    prompt - the transcript is not re-sent. Raises ValueError if the repair fails too.
+    """
+    with span("json.parse", task=task):
+        value, problems = parse_json(raw_text, VALIDATORS[task])
+    if value is not None:
+        return value
+    response = call_model(model, repair_prompt(task, raw_text, problems), api_key=api_key)
+    with span("json.parse", task=task, repair=True) as s:
+        value, problems = parse_json(response.text, VALIDATORS[task])
+        s.set(valid=value is not None)
+    if value is None:
+        raise ValueError(f"Invalid {task} format returned by AI: {'; '.join(problems[:3])}")
+    return value
+
+@traced("llm.quiz")
 def generate_quiz(transcript, api_key, persona="Standard"):
     """Generates a 3-question quiz with robust error handling."""
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(get_available_model())
+        model = get_model(api_key)
+        key = cache_key(transcript, persona, "quiz", model.model_name)
+        cached = get_cache().get(key)
+        if cached is not None:
+            annotate(cache="hit")
+            return cached
+        annotate(cache="miss")
         
         style = get_persona_instruction(persona)
         
@@ -79,7 +265,7 @@ def generate_quiz(transcript, api_key, persona="Standard"):
         Style Requirement: {style}
         
         Transcript:
-        {transcript[:30000]}
+        {transcript[:MAX_CHARS]}
 
         Output STRICTLY JSON (no markdown). Ensure every object has these EXACT keys:
         [
@@ -91,42 +277,212 @@ def generate_quiz(transcript, api_key, persona="Standard"):
             }}
         ]
         """
-        response = model.generate_content(prompt)
-        clean_text = response.text.replace("```json", "").replace("```", "").strip()
-        data = json.loads(clean_text)
+        response = call_model(model, prompt, api_key=api_key)
         
-        # VALIDATION: Ensure the data is a list and has the right keys
-        if isinstance(data, list):
-            valid_quiz = []
-            for item in data:
-                if "question" in item and "options" in item and "answer" in item:
-                    valid_quiz.append(item)
-            return valid_quiz
-        else:
-            return [{"error": "Invalid quiz format returned by AI"}]
+        # VALIDATION: Only well-formed questions survive; broken output gets one cheap repair
+        valid_quiz = parse_or_repair(model, response.text, "quiz", api_key)
+        get_cache().set(key, valid_quiz)
+        return valid_quiz
 
     except Exception as e:
+        annotate(error=str(e))
         return [{"error": str(e)}]
 
+def summary_prompt(text, style):
+    return f"""
+    Write a high-level executive summary of the following transcript.
+    Style Requirement: {style}
+    Use bullet points for readability. Keep it under 250 words.
+    
+    Transcript:
+    {text}
+    """
+
+def stream_response(model, prompt, stats=None):
+    """
+    Yields the model's text as it streams in.
+    If a stats dict is given it receives 'ttft' (seconds to first token)
+    and 'total' (seconds until the stream finished).
+    """
+    with span("gemini.stream", model=getattr(model, "model_name", None)) as s:
+        started = time.perf_counter()
+        response = call_model(model, prompt, stream=True)
+        for chunk in response:
+            if "ttft_ms" not in s.attrs:
+                s.set(ttft_ms=round((time.perf_counter() - started) * 1000, 2))
+                if stats is not None:
+                    stats["ttft"] = time.perf_counter() - started
+            yield chunk.text
+        record_tokens(response)
+        if stats is not None:
+            stats["total"] = time.perf_counter() - started
+
+@traced("llm.summary")
+def stream_summary(transcript, api_key, persona="Standard", stats=None):
+    """
+    Streaming executive summary; yields text chunks as they arrive.
+    Long transcripts are summarised section by section in parallel first,
+    then the section notes are condensed (and streamed) into the final summary.
+    Cached summaries are yielded in one piece.
+    Failures raise (possibly after some text was yielded), so a partial
+    summary is never mistaken for a finished one.
+    """
+    model = get_model(api_key)
+    key = cache_key(transcript, persona, "summary", model.model_name)
+    cached = get_cache().get(key)
+    annotate(cache="hit" if cached is not None else "miss")
+    if cached is not None:
+        if stats is not None:
+            stats["ttft"] = stats["total"] = 0.0
+        yield cached
+        return
+    
+    style = get_persona_instruction(persona)
+    chunks = list(iter_chunks(transcript))
+    if len(chunks) > 1:
+        section_notes = map_chunks(
+            lambda chunk: call_model(
+                model,
+                f"List the key points of this lecture section as terse bullet points.\n\n{chunk}",
+                api_key=api_key,
+            ).text.strip(),
+            chunks,
+        )
+        source = "\n\n".join(section_notes)
+    else:
+        source = transcript
+    
+    parts = []
+    for text in stream_response(model, summary_prompt(source, style), stats):
+        parts.append(text)
+        yield text
+    get_cache().set(key, "".join(parts).strip())
+
 def generate_summary(transcript, api_key, persona="Standard"):
-    """Generates a concise executive summary."""
+    """
+    Generates a concise executive summary (blocking form of stream_summary).
+    On failure the whole result is the error message - partial text is dropped.
+    """
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(get_available_model())
-        
-        style = get_persona_instruction(persona)
-        
-        prompt = f"""
-        Write a high-level executive summary of the following transcript.
-        Style Requirement: {style}
-        Use bullet points for readability. Keep it under 250 words.
-        
-        Transcript:
-        {transcript[:30000]}
-        """
-        
-        response = model.generate_content(prompt)
-        return response.text.strip()
-
+        return "".join(stream_summary(transcript, api_key, persona)).strip()
     except Exception as e:
-        return f"Error generating summary: {str(e)}"
\ No newline at end of file
+        return f"Error generating summary: {str(e)}"
+
+# --- COMBINED MODE: ONE REQUEST FOR ALL THREE ARTIFACTS ---
+COMBINED_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "graph": {
+            "type": "OBJECT",
+            "properties": {
+                "nodes": {"type": "ARRAY", "items": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "id": {"type": "STRING"},
+                        "label": {"type": "STRING"},
+                        "type": {"type": "STRING"},
+                    },
+                    "required": ["id", "label", "type"],
+                }},
+                "edges": {"type": "ARRAY", "items": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "source": {"type": "STRING"},
+                        "target": {"type": "STRING"},
+                        "label": {"type": "STRING"},
+                    },
+                    "required": ["source", "target"],
+                }},
+            },
+            "required": ["nodes", "edges"],
+        },
+        "quiz": {"type": "ARRAY", "items": {
+            "type": "OBJECT",
+            "properties": {
+                "question": {"type": "STRING"},
+                "options": {"type": "ARRAY", "items": {"type": "STRING"}},
+                "answer": {"type": "STRING"},
+                "explanation": {"type": "STRING"},
+            },
+            "required": ["question", "options", "answer"],
+        }},
+        "summary": {"type": "STRING"},
+    },
+    "required": ["graph", "quiz", "summary"],
+}
+
+def validate_section(task, value):
+    """Returns the section if it is usable, otherwise None."""
+    if task in VALIDATORS:
+        return VALIDATORS[task](value)[0]
+    if isinstance(value, str) and value.strip():
+        return value.strip()
+    return None
+
+@traced("llm.combined")
+def extract_all(transcript, api_key, persona="Standard"):
+    """
+    Combined mode: one structured request returns graph, quiz and summary.
+    Every section is validated on its own; a missing or malformed section
+    falls back to its per-task call, so all three keys are always present.
+    Transcripts that need chunking go straight to the per-task path.
+    """
+    fallbacks = {"graph": extract_knowledge_graph, "quiz": generate_quiz, "summary": generate_summary}
+    results = {task: None for task in fallbacks}
+
+    try:
+        model = get_model(api_key)
+        keys = {task: cache_key(transcript, persona, task, model.model_name) for task in fallbacks}
+        for task, key in keys.items():
+            results[task] = get_cache().get(key)
+
+        missing = [task for task, value in results.items() if value is None]
+        annotate(cache="hit" if not missing else "miss", cached_sections=len(results) - len(missing))
+        if missing and len(transcript) <= MAX_CHARS:
+            style = get_persona_instruction(persona)
+            prompt = f"""
+            You are a study-guide generator.
+            Style Requirement: {style}
+            
+            From the transcript produce, in one JSON object:
+            1. "graph": a knowledge graph. "nodes" have "id", "label" and "type"
+               ("core" for the main 3-5 topics, "sub" for supporting details);
+               "edges" have "source", "target" and a short relationship "label".
+               The graph must be INTERCONNECTED - link core concepts to each other
+               and sub concepts across parents; no isolated clusters.
+            2. "quiz": 3 multiple-choice questions with "question", 4 "options",
+               the exact text of the correct option as "answer", and an "explanation".
+            3. "summary": a high-level executive summary in bullet points, under 250 words.
+            
+            Transcript:
+            {transcript}
+            """
+            response = call_model(
+                model,
+                prompt,
+                generation_config={
+                    "response_mime_type": "application/json",
+                    "response_schema": COMBINED_SCHEMA,
+                },
+                api_key=api_key,
+            )
+            with span("json.parse", task="combined"):
+                data, _ = parse_json(response.text)
+            if not isinstance(data, dict):
+                data = {}
+            for task in missing:
+                section = validate_section(task, data.get(task))
+                if section is not None:
+                    results[task] = section
+                    get_cache().set(keys[task], section)
+    except Exception:
+        pass  # Whatever is still missing is regenerated per task below
+
+    missing = [task for task, value in results.items() if value is None]
+    if missing:
+        with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+            futures = {task: pool.submit(propagate(fallbacks[task]), transcript, api_key, persona)
+                       for task in missing}
+        for task, future in futures.items():
+            results[task] = future.result()
+    return results
@@ -0,0 +1,286 @@
+import json
+from functools import partial
+
+# Shapes shown to the model when it is asked to repair its own output
+SCHEMA_HINTS = {
+    "graph": '{"nodes": [{"id": str, "label": str, "type": "core"|"sub"}], '
+             '"edges": [{"source": node id, "target": node id, "label": str}]}',
+    "graph_delta": '{"nodes": [{"id": str, "label": str, "type": "core"|"sub"}] (may be empty), '
+                   '"edges": [{"source": node id, "target": node id, "label": str}]}',
+    "quiz": '[{"question": str, "options": [str, str, str, str], '
+            '"answer": one of the options, "explanation": str}]',
+}
+
+MAX_START_CANDIDATES = 20  # How many '{' / '[' positions to try before giving up
+
+
+# --- STEP 1: FIND THE JSON IN THE TEXT ---
+def balanced_span(text, start):
+    """
+    Returns the text of the JSON value opening at `start`, up to its matching
+    close bracket. Unterminated values (truncated output) run to the end.
+    """
+    depth, quote, escaped = 0, None, False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if quote:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == quote:
+                quote = None
+        elif ch in '"\'':
+            quote = ch
+        elif ch in '{[':
+            depth += 1
+        elif ch in '}]':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def candidate_spans(text):
+    """Yields every plausible JSON value in the text, first one first."""
+    found = 0
+    for i, ch in enumerate(text):
+        if ch in '{[':
+            yield balanced_span(text, i)
+            found += 1
+            if found >= MAX_START_CANDIDATES:
+                return
+
+
+# --- STEP 2: FIX COMMON LLM FORMATTING MISTAKES ---
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def skip_filler(text, i):
+    """Index of the next character at or after `i` that is not whitespace or a comment."""
+    n = len(text)
+    while i < n:
+        if text[i].isspace():
+            i += 1
+        elif text.startswith('//', i):
+            end = text.find('\n', i)
+            i = n if end == -1 else end
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+        else:
+            break
+    return i
+
+
+def repair_json(text):
+    """
+    Rewrites near-JSON into JSON: strips comments and trailing commas, turns
+    single-quoted strings and Python literals into JSON ones, escapes raw
+    newlines inside strings and closes brackets left open by truncation.
+    """
+    out, closers = [], []
+    quote = None
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+
+        if quote:
+            if ch == '\\' and i + 1 < n:
+                nxt = text[i + 1]
+                out.append("'" if nxt == "'" else ch + nxt)
+                i += 2
+                continue
+            if ch == quote:
+                out.append('"')
+                quote = None
+            elif ch == '"':
+                out.append('\\"')  # Double quote inside a single-quoted string
+            elif ch == '\n':
+                out.append('\\n')
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch in '"\'':
+            quote = ch
+            out.append('"')
+        elif text.startswith('//', i):
+            end = text.find('\n', i)
+            i = n if end == -1 else end
+            continue
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            continue
+        elif ch == ',':
+            j = skip_filler(text, i + 1)
+            if j < n and text[j] not in '}]':
+                out.append(ch)
+        elif ch in '{[':
+            closers.append('}' if ch == '{' else ']')
+            out.append(ch)
+        elif ch in '}]':
+            if closers:
+                closers.pop()
+            out.append(ch)
+        else:
+            for word, literal in _LITERALS.items():
+                if text.startswith(word, i) and not text[i + len(word):i + len(word) + 1].isalnum():
+                    out.append(literal)
+                    i += len(word)
+                    break
+            else:
+                out.append(ch)
+                i += 1
+            continue
+        i += 1
+
+    if quote:
+        out.append('"')
+    out.extend(reversed(closers))
+    return "".join(out)
+
+
+# --- STEP 3: VALIDATE AGAINST THE EXPECTED SHAPE ---
+def validate_graph(value, allow_empty=False):
+    """
+    Checks a knowledge graph, fixing what can be fixed (missing labels,
+    unknown node types, numeric ids). Returns (graph or None, problems).
+    allow_empty accepts a graph with no nodes (an incremental delta may only add edges).
+    """
+    problems = []
+    if not isinstance(value, dict) or not isinstance(value.get('nodes'), list):
+        return None, ["expected an object with a 'nodes' list"]
+
+    nodes = []
+    for node in value['nodes']:
+        if not isinstance(node, dict) or not (node.get('id') or node.get('label')):
+            problems.append(f"node without id: {node!r}"[:120])
+            continue
+        node_id = str(node.get('id') or node['label'])
+        nodes.append(dict(
+            node,
+            id=node_id,
+            label=str(node.get('label') or node_id),
+            type=node.get('type') if node.get('type') in ('core', 'sub') else 'sub',
+        ))
+
+    edges = []
+    raw_edges = value.get('edges', [])
+    if not isinstance(raw_edges, list):
+        problems.append("'edges' is not a list")
+        raw_edges = []
+    for edge in raw_edges:
+        if not isinstance(edge, dict) or 'source' not in edge or 'target' not in edge:
+            problems.append(f"edge without source/target: {edge!r}"[:120])
+            continue
+        edges.append(dict(edge, source=str(edge['source']), target=str(edge['target'])))
+
+    if not nodes and not allow_empty:
+        return None, problems or ["graph has no nodes"]
+    return {"nodes": nodes, "edges": edges}, problems
+
+
+def validate_quiz(value):
+    """
+    Checks quiz items, dropping broken ones. An answer given as an option
+    letter ("B") or in different case is mapped onto the option text.
+    Returns (questions or None, problems).
+    """
+    problems = []
+    if isinstance(value, dict):
+        value = value.get('quiz', value.get('questions'))
+    if not isinstance(value, list):
+        return None, ["expected a list of questions"]
+
+    questions = []
+    for item in value:
+        if not isinstance(item, dict) or not all(k in item for k in ('question', 'options', 'answer')):
+            problems.append(f"question missing question/options/answer: {item!r}"[:120])
+            continue
+        options = [str(o) for o in item['options']] if isinstance(item['options'], list) else []
+        if len(options) < 2:
+            problems.append(f"question has fewer than 2 options: {item['question']!r}"[:120])
+            continue
+
+        answer = str(item['answer']).strip()
+        by_text = {o.strip().lower(): o for o in options}
+        if answer.lower() in by_text:
+            answer = by_text[answer.lower()]
+        elif len(answer) == 1 and answer.upper() in "ABCDEFGH"[:len(options)]:
+            answer = options["ABCDEFGH".index(answer.upper())]
+        else:
+            problems.append(f"answer is not one of the options: {item['question']!r}"[:120])
+            continue
+
+        questions.append(dict(item, question=str(item['question']), options=options, answer=answer,
+                              explanation=str(item.get('explanation', ''))))
+
+    if not questions:
+        return None, problems or ["quiz has no questions"]
+    return questions, problems
+
+
+VALIDATORS = {
+    "graph": validate_graph,
+    "graph_delta": partial(validate_graph, allow_empty=True),
+    "quiz": validate_quiz,
+}
+
+
+def parse_attempts(span, max_trims=3):
+    """Texts to try for one span: as-is, repaired, and for truncated output, cut back to earlier commas."""
+    yield span
+    yield repair_json(span)
+    if span.rstrip().endswith(('}', ']')):
+        return
+    cut = len(span)
+    for _ in range(max_trims):
+        cut = span.rfind(',', 0, cut)
+        if cut == -1:
+            return
+        yield repair_json(span[:cut])
+
+
+def parse_json(text, validator=None):
+    """
+    Pulls the first usable JSON value out of raw model output.
+    Each candidate is tried as-is, then repaired; with a validator, the first
+    candidate it accepts wins. Returns (value or None, problems), where
+    problems describe the first candidate (the one the model most likely meant).
+    """
+    problems = []
+    for index, span in enumerate(candidate_spans(text or "")):
+        for candidate in parse_attempts(span):
+            try:
+                value = json.loads(candidate)
+            except ValueError as e:
+                issues = [f"invalid JSON: {e}"]
+            else:
+                if validator is None:
+                    return value, []
+                cleaned, issues = validator(value)
+                if cleaned is not None:
+                    return cleaned, issues
+            if index == 0:
+                problems.extend(issues)
+    return None, problems or ["no JSON object or array found"]
+
+
+def repair_prompt(task, raw_text, problems):
+    """Small follow-up prompt asking the model to fix only its own output."""
+    issues = "\n".join(f"- {p}" for p in problems[:10])
+    return f"""
+    The JSON below does not parse or does not match the required shape.
+    Problems:
+    {issues}
+
+    Required shape:
+    {SCHEMA_HINTS[task]}
+
+    Return ONLY the corrected JSON, no markdown, no commentary.
+
+    {raw_text[:20000]}
+    """
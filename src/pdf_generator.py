@@ -1,62 +1,241 @@
+import functools
+import hashlib
+import os
+import re
+
 from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+
+from src.analytics import concept_importance
+from src.knowledge_graph import KnowledgeGraph, graph_hash
+from src.layout import canvas_positions
+from src.telemetry import span, traced
+
+# Unicode TTF fonts tried in order; VIDGRAPH_PDF_FONT (a .ttf path) goes first.
+# Bold/italic faces are looked up next to the regular file.
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf",
+    "/usr/share/fonts/noto/NotoSans-Regular.ttf",
+    "/System/Library/Fonts/Supplemental/Arial Unicode.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf",
+]
+# Fonts with Chinese/Japanese/Korean glyphs, drawn from wherever the main font
+# has none; VIDGRAPH_PDF_CJK_FONT goes first. Collections (.ttc) use their first face.
+CJK_FONT_CANDIDATES = [
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/usr/share/fonts/wenquanyi/wqy-microhei/wqy-microhei.ttc",
+    "/System/Library/Fonts/Supplemental/Arial Unicode.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "C:\\Windows\\Fonts\\msyh.ttc",
+    "C:\\Windows\\Fonts\\malgun.ttf",
+]
+# Hangul Jamo, CJK punctuation/kana/ideographs, Hangul syllables, compatibility ideographs, full-width forms
+CJK_TEXT = re.compile(r'[\u1100-\u11ff\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+STYLE_SUFFIXES = {
+    "B": ["-Bold", "Bold", "bd", "-Bold-Regular"],
+    "I": ["-Oblique", "-Italic", "Italic", "i"],
+}
+
+GRAPH_PAGE_NODES = 300   # Most important concepts drawn on the graph page
+GRAPH_PAGE_LABELS = 40   # Of those, how many get a text label
+
+
+@functools.lru_cache(maxsize=1)
+def find_fonts():
+    """
+    {style: ttf path} for the first Unicode font found, or None to fall back
+    to the built-in Latin-1 Helvetica. Resolved once per process.
+    """
+    candidates = [os.getenv("VIDGRAPH_PDF_FONT")] + FONT_CANDIDATES
+    for regular in candidates:
+        if not regular or not os.path.isfile(regular):
+            continue
+        stem, ext = os.path.splitext(regular)
+        base = stem[:-len("-Regular")] if stem.endswith("-Regular") else stem
+        fonts = {"": regular}
+        for style, suffixes in STYLE_SUFFIXES.items():
+            # Missing faces reuse the regular file (no faux bold, but no crash either)
+            fonts[style] = next(
+                (base + s + ext for s in suffixes if os.path.isfile(base + s + ext)), regular
+            )
+        return fonts
+    return None
+
+
+@functools.lru_cache(maxsize=1)
+def find_cjk_font():
+    """Path of the first CJK font found, or None. Resolved once per process."""
+    for path in [os.getenv("VIDGRAPH_PDF_CJK_FONT")] + CJK_FONT_CANDIDATES:
+        if path and os.path.isfile(path):
+            return path
+    return None
+
+
+def has_cjk(summary_text, graph_data, quiz_data):
+    """True if any text of the guide needs the CJK fallback font."""
+    texts = [summary_text] + [node['label'] for node in graph_data.get('nodes', [])]
+    texts += [str(value) for q in quiz_data for value in q.values()]
+    return any(CJK_TEXT.search(text) for text in texts)
+
+
+def guide_hash(summary_text, graph_data, quiz_data):
+    """Content hash of everything that goes into a study guide."""
+    digest = hashlib.sha256()
+    for part in (summary_text, graph_hash(graph_data), graph_hash({"quiz": quiz_data})):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
 
 class PDF(FPDF):
+    def __init__(self, cjk=False):
+        super().__init__()
+        fonts = find_fonts()
+        if fonts is not None:
+            for style, path in fonts.items():
+                self.add_font("guide", style, path)
+            self.font_name = "guide"
+            # CJK fonts are large to parse, so only guides that need one load it
+            if cjk and find_cjk_font() is not None:
+                self.add_font("guide-cjk", "", find_cjk_font())
+                self.set_fallback_fonts(["guide-cjk"], exact_match=False)
+        else:
+            self.font_name = "helvetica"
+        self.unicode = fonts is not None
+
+    def safe(self, value):
+        """Core fonts only cover Latin-1; a Unicode font takes the text as is."""
+        if self.unicode:
+            return value
+        return value.encode('latin-1', 'replace').decode('latin-1')
+
     def header(self):
-        self.set_font('Arial', 'B', 15)
-        self.cell(0, 10, 'VidGraph.ai - Study Guide', 0, 1, 'C')
+        self.set_font(self.font_name, 'B', 15)
+        self.cell(0, 10, 'VidGraph.ai - Study Guide', align='C', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
         self.ln(10)
 
     def chapter_title(self, title):
-        self.set_font('Arial', 'B', 12)
+        self.set_font(self.font_name, 'B', 12)
         self.set_fill_color(200, 220, 255)
-        self.cell(0, 10, title, 0, 1, 'L', 1)
+        self.cell(0, 10, self.safe(title), fill=True, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
         self.ln(4)
 
     def chapter_body(self, body):
-        self.set_font('Arial', '', 11)
-        # Latin-1 fix: Replace characters that might crash the PDF generator
-        safe_body = body.encode('latin-1', 'replace').decode('latin-1')
-        self.multi_cell(0, 6, safe_body)
+        self.set_font(self.font_name, '', 11)
+        self.multi_cell(0, 6, self.safe(body), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
         self.ln()
 
-def create_pdf(summary_text, graph_data, quiz_data):
-    pdf = PDF()
+    def graph_page(self, graph_data):
+        """
+        The knowledge graph drawn as vectors (sharp at any zoom, no image
+        libraries) from the same force layout and importance scores as the app.
+        """
+        graph = KnowledgeGraph.from_data(graph_data)
+        if len(graph) == 0:
+            return
+        scores = concept_importance(graph)
+        ranked = sorted(graph.nodes, key=lambda node_id: -scores.get(node_id, 0))
+        shown = set(ranked[:GRAPH_PAGE_NODES])
+        positions = canvas_positions(graph, graph_hash(graph_data), "force")
+
+        self.add_page(orientation="L")
+        self.chapter_title("5. Knowledge Graph Map")
+        # Fit the layout into the space left on the page, keeping its aspect ratio
+        left, top = self.l_margin, self.get_y()
+        width, height = self.w - self.l_margin - self.r_margin, self.h - top - 15
+        xs = [positions[node_id][0] for node_id in shown]
+        ys = [positions[node_id][1] for node_id in shown]
+        span = max(max(xs) - min(xs), max(ys) - min(ys), 1e-9)
+        scale = min(width, height) / span
+        offset_x = left + (width - (max(xs) - min(xs)) * scale) / 2 - min(xs) * scale
+        offset_y = top + (height - (max(ys) - min(ys)) * scale) / 2 - min(ys) * scale
+        page = {node_id: (offset_x + positions[node_id][0] * scale, offset_y + positions[node_id][1] * scale)
+                for node_id in shown}
+
+        self.set_draw_color(200, 200, 200)
+        for (source, target), edge in graph.edges.items():
+            if source in page and target in page:
+                self.set_line_width(0.2 * min(edge['weight'], 5))
+                self.line(*page[source], *page[target])
+
+        self.set_line_width(0.2)
+        for node_id in ranked[:GRAPH_PAGE_NODES]:
+            x, y = page[node_id]
+            radius = 1 + 12 * scores.get(node_id, 0) ** 0.5
+            color = (255, 107, 107) if graph.nodes[node_id].get('type') == 'core' else (78, 205, 196)
+            self.set_fill_color(*color)
+            self.ellipse(x - radius, y - radius, 2 * radius, 2 * radius, style="F")
+
+        self.set_text_color(51, 51, 51)
+        for node_id in ranked[:GRAPH_PAGE_LABELS]:
+            x, y = page[node_id]
+            radius = 1 + 12 * scores.get(node_id, 0) ** 0.5
+            self.set_font(self.font_name, 'B' if graph.nodes[node_id].get('type') == 'core' else '', 7)
+            label = self.safe(graph.nodes[node_id]['label'])
+            self.text(x - self.get_string_width(label) / 2, y + radius + 3, label)
+        self.set_text_color(0, 0, 0)
+
+
+@traced("pdf.build")
+def create_pdf(summary_text, graph_data, quiz_data, out=None):
+    """
+    Builds the study guide. With `out` (a path or binary file object) the
+    document is written straight there and None is returned; otherwise the
+    PDF bytes are returned.
+    """
+    pdf = PDF(cjk=has_cjk(summary_text, graph_data, quiz_data))
     pdf.add_page()
-    
+
     # 1. Executive Summary
     pdf.chapter_title("1. Executive Summary")
     pdf.chapter_body(summary_text)
-    
+
     # 2. Key Concepts (Graph Data)
     pdf.chapter_title("2. Key Concepts (Knowledge Graph)")
-    for node in graph_data['nodes']:
+    for node in graph_data.get('nodes', []):
         label = node['label']
         prefix = "[CORE]" if node.get('type') == 'core' else "-"
         pdf.chapter_body(f"{prefix} {label}")
-        
+
     # 3. Practice Quiz
+    questions = [q for q in quiz_data if 'question' in q]
     pdf.add_page()
     pdf.chapter_title("3. Practice Quiz")
-    
-    for i, q in enumerate(quiz_data):
-        pdf.set_font('Arial', 'B', 11)
-        # Sanitize question text
-        q_text = q['question'].encode('latin-1', 'replace').decode('latin-1')
-        pdf.multi_cell(0, 6, f"Q{i+1}: {q_text}")
-        
-        pdf.set_font('Arial', '', 11)
+
+    for i, q in enumerate(questions):
+        pdf.set_font(pdf.font_name, 'B', 11)
+        pdf.multi_cell(0, 6, pdf.safe(f"Q{i+1}: {q['question']}"), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+        pdf.set_font(pdf.font_name, '', 11)
         for opt in q['options']:
-            # Sanitize option text
-            opt_clean = opt.encode('latin-1', 'replace').decode('latin-1')
-            pdf.cell(0, 6, f"   - {opt_clean}", 0, 1)
+            pdf.multi_cell(0, 6, pdf.safe(f"   - {opt}"), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
         pdf.ln(2)
-        
+
     # 4. Answer Key
     pdf.ln(10)
-    pdf.set_font('Arial', 'I', 10)
-    pdf.cell(0, 10, "--- Answer Key ---", 0, 1)
-    for i, q in enumerate(quiz_data):
-        ans_clean = q['answer'].encode('latin-1', 'replace').decode('latin-1')
-        pdf.cell(0, 6, f"Q{i+1}: {ans_clean}", 0, 1)
-        
-    return pdf.output(dest='S').encode('latin-1')
\ No newline at end of file
+    pdf.set_font(pdf.font_name, 'I', 10)
+    pdf.cell(0, 10, "--- Answer Key ---", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    for i, q in enumerate(questions):
+        pdf.multi_cell(0, 6, pdf.safe(f"Q{i+1}: {q['answer']}"), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+    # 5. The graph itself, as a final landscape page
+    with span("pdf.graph_page"):
+        pdf.graph_page(graph_data)
+
+    with span("pdf.output"):
+        if out is None:
+            return bytes(pdf.output())
+        if isinstance(out, (str, os.PathLike)):
+            pdf.output(out)
+        else:
+            out.write(pdf.output())
+    return None
+
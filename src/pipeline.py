@@ -0,0 +1,102 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from src.llm_engine import extract_knowledge_graph, generate_quiz, generate_summary, extract_all
+
+# Each job maps to the engine function that produces it
+TASKS = {
+    "graph": extract_knowledge_graph,
+    "quiz": generate_quiz,
+    "summary": generate_summary,
+}
+
+# Seconds each job may run before it is abandoned
+DEFAULT_TIMEOUTS = {
+    "graph": 120,
+    "quiz": 90,
+    "summary": 90,
+}
+
+
+def error_result(task, message):
+    """Returns an error value shaped like the task's own failure output."""
+    if task == "graph":
+        return {"error": f"Graph Error: {message}"}
+    if task == "quiz":
+        return [{"error": message}]
+    return f"Error generating summary: {message}"
+
+
+class PipelineRun:
+    """
+    Runs the Visualize jobs concurrently on a thread pool.
+    Jobs are submitted as soon as the run is created, so wall-clock
+    latency is the slowest call instead of the sum of all of them.
+    With combined=True a single structured request produces every task.
+    """
+
+    def __init__(self, transcript, api_key, persona="Standard", tasks=tuple(TASKS), timeouts=None, combined=False):
+        self.tasks = tuple(tasks)
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self._executor = ThreadPoolExecutor(max_workers=len(self.tasks), thread_name_prefix="vidgraph")
+        self._jobs = {}  # future -> (tasks it produces, deadline)
+
+        started = time.monotonic()
+        if combined:
+            future = self._executor.submit(extract_all, transcript, api_key, persona)
+            deadline = started + max(self.timeouts[task] for task in self.tasks)
+            self._jobs[future] = (self.tasks, deadline)
+        else:
+            for task in self.tasks:
+                future = self._executor.submit(TASKS[task], transcript, api_key, persona)
+                self._jobs[future] = ((task,), started + self.timeouts[task])
+
+    def results(self):
+        """
+        Yields (task, result) pairs in completion order.
+        A job that passes its deadline is cancelled and yields error results
+        instead, so the caller always receives one entry per task.
+        """
+        pending = set(self._jobs)
+        try:
+            while pending:
+                next_deadline = min(self._jobs[f][1] for f in pending)
+                done, pending = wait(
+                    pending,
+                    timeout=max(0, next_deadline - time.monotonic()),
+                    return_when=FIRST_COMPLETED,
+                )
+
+                for future in done:
+                    tasks = self._jobs[future][0]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        for task in tasks:
+                            yield task, error_result(task, str(e))
+                        continue
+                    if len(tasks) == 1:
+                        yield tasks[0], result
+                    else:
+                        for task in tasks:
+                            yield task, result[task]
+
+                # Abandon anything that ran past its own deadline
+                now = time.monotonic()
+                for future in [f for f in pending if self._jobs[f][1] <= now]:
+                    pending.discard(future)
+                    future.cancel()
+                    for task in self._jobs[future][0]:
+                        yield task, error_result(task, f"timed out after {self.timeouts[task]}s")
+        finally:
+            self.cancel()
+
+    def cancel(self):
+        """Drops queued jobs and releases the pool without waiting on running calls."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_pipeline(transcript, api_key, persona="Standard", tasks=tuple(TASKS), timeouts=None, combined=False):
+    """Blocking helper: runs the jobs concurrently and returns {task: result}."""
+    run = PipelineRun(transcript, api_key, persona, tasks, timeouts, combined)
+    return dict(run.results())
@@ -0,0 +1,58 @@
+import threading
+import time
+
+
+def estimate_tokens(text):
+    """Rough Gemini token count (~4 characters per token) used for budgeting."""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `rate_per_minute`.
+    acquire() blocks until enough tokens are available.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+    def _reserve(self, amount):
+        """Takes `amount` tokens now if possible; otherwise returns seconds to wait."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.rate
+
+    def acquire(self, amount=1):
+        # A request bigger than the whole bucket waits for a full bucket, then goes through
+        amount = min(float(amount), self.capacity)
+        while True:
+            wait = self._reserve(amount)
+            if wait <= 0:
+                return
+            self._sleep(wait)
+
+
+class RateLimiter:
+    """Client-side requests/min and tokens/min limits; either may be None (unlimited)."""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, clock=time.monotonic, sleep=time.sleep):
+        self.requests = TokenBucket(requests_per_minute, clock=clock, sleep=sleep) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, clock=clock, sleep=sleep) if tokens_per_minute else None
+
+    def acquire(self, prompt=""):
+        """Blocks until one more request carrying `prompt` fits within both budgets."""
+        if self.requests is not None:
+            self.requests.acquire(1)
+        if self.tokens is not None:
+            self.tokens.acquire(estimate_tokens(prompt))
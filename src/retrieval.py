@@ -0,0 +1,112 @@
+import re
+import numpy as np
+
+from src.chunking import iter_chunks, normalize_label
+
+PASSAGE_CHARS = 1200   # Size of each retrievable passage
+PASSAGE_OVERLAP = 200
+TOP_K = 4              # Passages injected per chat turn
+HISTORY_TURNS = 6      # Previous chat messages kept in the prompt
+
+_TOKEN = re.compile(r"\w+")
+_STOPWORDS = set("""
+a an and are as at be but by can do does for from has have how i if in is it its
+me my of on or so that the their them then there these this to was we what when
+where which who why will with you your
+""".split())
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class TranscriptIndex:
+    """
+    BM25 index over short transcript passages.
+    Term weights are precomputed into a dense NumPy matrix once, so scoring a
+    question is a column gather and a row sum.
+    """
+
+    def __init__(self, transcript, passage_chars=PASSAGE_CHARS, overlap=PASSAGE_OVERLAP, k1=1.5, b=0.75):
+        self.passages = list(iter_chunks(transcript, passage_chars, overlap))
+        docs = [tokenize(p) for p in self.passages]
+
+        self.vocab = {}
+        for doc in docs:
+            for term in doc:
+                self.vocab.setdefault(term, len(self.vocab))
+
+        tf = np.zeros((len(docs), max(len(self.vocab), 1)), dtype=np.float32)
+        for row, doc in enumerate(docs):
+            if not doc:
+                continue
+            ids, counts = np.unique([self.vocab[t] for t in doc], return_counts=True)
+            tf[row, ids] = counts
+
+        n_docs = len(docs)
+        df = (tf > 0).sum(axis=0)
+        idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        doc_len = tf.sum(axis=1)
+        length_norm = k1 * (1 - b + b * doc_len / max(doc_len.mean(), 1))
+        self._weights = idf * tf * (k1 + 1) / (tf + length_norm[:, None])
+
+    def search(self, query, k=TOP_K):
+        """Returns up to k (passage, score) pairs, most relevant first."""
+        ids = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not ids:
+            return []
+        scores = self._weights[:, ids].sum(axis=1)
+        top = np.argsort(-scores)[:k]
+        return [(self.passages[i], float(scores[i])) for i in top if scores[i] > 0]
+
+
+def graph_neighborhood(graph_data, question, max_edges=20):
+    """Relationship lines around the graph concepts mentioned in the question."""
+    if not graph_data or "error" in graph_data:
+        return []
+
+    question_norm = f" {normalize_label(question)} "
+    mentioned = {
+        node['id'] for node in graph_data['nodes']
+        if f" {normalize_label(node['label'])} " in question_norm
+    }
+    labels = {node['id']: node['label'] for node in graph_data['nodes']}
+
+    lines = []
+    for edge in graph_data['edges']:
+        if edge['source'] in mentioned or edge['target'] in mentioned:
+            source = labels.get(edge['source'], edge['source'])
+            target = labels.get(edge['target'], edge['target'])
+            lines.append(f"{source} --{edge.get('label', 'relates to')}--> {target}")
+            if len(lines) >= max_edges:
+                break
+    return lines
+
+
+def build_tutor_prompt(question, index, graph_data=None, history=(), persona="Standard", k=TOP_K):
+    """Chat prompt carrying only the relevant passages, graph neighbourhood and recent turns."""
+    hits = index.search(question, k)
+    if hits:
+        passages = "\n---\n".join(passage.strip() for passage, _ in hits)
+    else:
+        # Nothing matched lexically; fall back to the opening of the lecture
+        passages = index.passages[0].strip() if index.passages else ""
+
+    relations = graph_neighborhood(graph_data, question)
+    recent = "\n".join(f"{m['role']}: {m['content']}" for m in list(history)[-HISTORY_TURNS:])
+
+    return f"""
+    You are a Socratic tutor. Answer strictly from the lecture excerpts below.
+    Persona: {persona}
+
+    Lecture excerpts:
+    {passages}
+
+    Related concepts:
+    {chr(10).join(relations) or "(none)"}
+
+    Conversation so far:
+    {recent or "(new conversation)"}
+
+    Question: {question}
+    """
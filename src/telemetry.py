@@ -0,0 +1,325 @@
+"""
+Lightweight tracing for the Visualize pipeline.
+
+Stages are timed with `span("name")` (or the `@traced("name")` decorator);
+spans nest per thread, and counters such as token counts and retries added
+inside a child also roll up into its parents. Each finished span is handed
+to the configured sinks:
+
+    VIDGRAPH_TELEMETRY="stdout,jsonl:traces.jsonl,prometheus:vidgraph.prom"
+
+Recent spans are always kept in memory for the app's debug panel.
+"""
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+RECENT_SPANS = 500  # Finished spans kept in memory for the debug panel
+
+_local = threading.local()
+_counter_lock = threading.Lock()
+
+
+class Span:
+    """One timed stage. `attrs` ends up in the emitted record."""
+
+    def __init__(self, name, parent=None, **attrs):
+        self.name = name
+        self.parent = parent
+        self.attrs = dict(attrs)
+        self.started = time.time()
+        self._clock = time.perf_counter()
+        self.seconds = None
+        self.error = None
+
+    def set(self, **attrs):
+        """Attributes of this span only (e.g. cache="hit")."""
+        self.attrs.update(attrs)
+
+    def add(self, key, amount=1):
+        """Counter that also rolls up into every enclosing span (tokens, retries)."""
+        with _counter_lock:
+            span = self
+            while span is not None:
+                span.attrs[key] = span.attrs.get(key, 0) + amount
+                span = span.parent
+
+    def record(self):
+        return {
+            "ts": round(self.started, 3),
+            "stage": self.name,
+            "ms": round(self.seconds * 1000, 2),
+            "parent": self.parent.name if self.parent is not None else None,
+            "error": self.error,
+            **self.attrs,
+        }
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def current_span():
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Times one stage:
+
+        with span("graph.pagerank", nodes=len(graph)) as s:
+            ...
+            s.set(converged=True)
+    """
+    s = Span(name, current_span(), **attrs)
+    stack = _stack()
+    stack.append(s)
+    try:
+        yield s
+    except GeneratorExit:
+        raise  # A stream the caller stopped reading is not a failure
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.seconds = time.perf_counter() - s._clock
+        if s in stack:
+            stack.remove(s)  # Generators may finish out of order
+        get_tracer().emit(s)
+
+
+def traced(name):
+    """Decorator form of `span`; generator functions are timed until exhausted."""
+    def decorate(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def gen_wrapper(*args, **kwargs):
+                with span(name):
+                    yield from fn(*args, **kwargs)
+            return gen_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def annotate(**attrs):
+    """Sets attributes on the innermost open span (no-op outside any span)."""
+    s = current_span()
+    if s is not None:
+        s.set(**attrs)
+
+
+def count(key, amount=1):
+    """Adds to a counter on the innermost open span and its parents."""
+    s = current_span()
+    if s is not None:
+        s.add(key, amount)
+
+
+def record_tokens(response):
+    """Adds Gemini's reported prompt/response token counts, if the response carries them."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    response_tokens = getattr(usage, "candidates_token_count", 0) or 0
+    if prompt_tokens:
+        count("prompt_tokens", prompt_tokens)
+    if response_tokens:
+        count("response_tokens", response_tokens)
+
+
+def propagate(fn):
+    """
+    Wraps `fn` for a worker thread so spans it opens are children of the
+    span that is open here (thread pools don't inherit the span stack).
+    """
+    parent = current_span()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        stack = _stack()
+        stack.append(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            stack.remove(parent)
+    return wrapper if parent is not None else fn
+
+
+# --- SINKS ---
+class MemorySink:
+    """Ring buffer of recent span records (feeds the Streamlit debug panel)."""
+
+    def __init__(self, size=RECENT_SPANS):
+        self.records = deque(maxlen=size)
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def recent(self):
+        return list(self.records)
+
+
+class StdoutSink:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        with self._lock:
+            print(json.dumps(record, default=str), file=self.stream, flush=True)
+
+
+class JsonlSink:
+    """Appends one JSON object per span to a file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class PrometheusSink:
+    """
+    Per-stage counters in Prometheus text exposition format. With a path the
+    file is rewritten after each span (node_exporter textfile collector).
+    """
+
+    COUNTERS = [
+        ("calls", "vidgraph_stage_calls_total", "Finished spans per stage."),
+        ("errors", "vidgraph_stage_errors_total", "Spans that raised."),
+        ("seconds", "vidgraph_stage_seconds_total", "Wall time spent per stage."),
+        ("prompt_tokens", "vidgraph_stage_prompt_tokens_total", "Gemini prompt tokens."),
+        ("response_tokens", "vidgraph_stage_response_tokens_total", "Gemini response tokens."),
+        ("retries", "vidgraph_stage_retries_total", "Retried Gemini requests."),
+        ("cache_hit", "vidgraph_stage_cache_hits_total", "Result cache hits."),
+        ("cache_miss", "vidgraph_stage_cache_misses_total", "Result cache misses."),
+    ]
+
+    def __init__(self, path=None):
+        self.path = path
+        self.totals = {}  # stage -> {counter: value}
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        with self._lock:
+            totals = self.totals.setdefault(record["stage"], {})
+            increments = {
+                "calls": 1,
+                "errors": 1 if record.get("error") else 0,
+                "seconds": record["ms"] / 1000,
+                "prompt_tokens": record.get("prompt_tokens", 0),
+                "response_tokens": record.get("response_tokens", 0),
+                "retries": record.get("retries", 0),
+                "cache_hit": 1 if record.get("cache") == "hit" else 0,
+                "cache_miss": 1 if record.get("cache") == "miss" else 0,
+            }
+            for key, value in increments.items():
+                totals[key] = totals.get(key, 0) + value
+            text = self.render_locked()
+        if self.path:
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(self.path + ".tmp", self.path)
+
+    def render(self):
+        with self._lock:
+            return self.render_locked()
+
+    def render_locked(self):
+        lines = []
+        for key, metric, help_text in self.COUNTERS:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for stage, totals in sorted(self.totals.items()):
+                lines.append(f'{metric}{{stage="{stage}"}} {totals.get(key, 0):g}')
+        return "\n".join(lines) + "\n"
+
+
+SINKS = {"stdout": StdoutSink, "jsonl": JsonlSink, "prometheus": PrometheusSink}
+
+
+def sinks_from_env(spec=None):
+    """Parses VIDGRAPH_TELEMETRY ("stdout,jsonl:path,prometheus:path") into sink objects."""
+    spec = os.getenv("VIDGRAPH_TELEMETRY", "") if spec is None else spec
+    sinks = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        kind, _, target = entry.partition(":")
+        if kind not in SINKS:
+            raise ValueError(f"Unknown telemetry sink '{kind}' (choose from {', '.join(SINKS)})")
+        sinks.append(SINKS[kind](target) if target else SINKS[kind]())
+    return sinks
+
+
+class Tracer:
+    """Fans finished spans out to the sinks; a failing sink never breaks the pipeline."""
+
+    def __init__(self, sinks=()):
+        self.memory = MemorySink()
+        self.sinks = list(sinks)
+
+    def emit(self, s):
+        record = s.record()
+        self.memory.emit(record)
+        for sink in self.sinks:
+            try:
+                sink.emit(record)
+            except Exception as e:
+                print(f"telemetry sink {type(sink).__name__} failed: {e}", file=sys.stderr)
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(sinks_from_env())
+        return _tracer
+
+
+def set_tracer(tracer):
+    global _tracer
+    with _tracer_lock:
+        _tracer = tracer
+
+
+def stage_summary(records):
+    """Per-stage totals of span records: calls, total/max ms, tokens, cache hits, retries."""
+    stages = {}
+    for record in records:
+        row = stages.setdefault(record["stage"], {
+            "stage": record["stage"], "calls": 0, "total_ms": 0.0, "max_ms": 0.0,
+            "prompt_tokens": 0, "response_tokens": 0, "cache_hits": 0, "retries": 0, "errors": 0,
+        })
+        row["calls"] += 1
+        row["total_ms"] = round(row["total_ms"] + record["ms"], 2)
+        row["max_ms"] = max(row["max_ms"], record["ms"])
+        row["prompt_tokens"] += record.get("prompt_tokens", 0)
+        row["response_tokens"] += record.get("response_tokens", 0)
+        row["cache_hits"] += record.get("cache") == "hit"
+        row["retries"] += record.get("retries", 0)
+        row["errors"] += bool(record.get("error"))
+    return sorted(stages.values(), key=lambda row: -row["total_ms"])
@@ -0,0 +1,92 @@
+"""
+Transcript chunking and merging of the per-chunk graphs.
+"""
+from src.chunking import iter_chunks, iter_units, merge_graphs, normalize_label
+
+SENTENCES = " ".join(f"Sentence number {i} is about topic {i % 7}." for i in range(60))
+
+
+# --- CHUNKING ---
+def test_short_transcript_is_one_chunk():
+    assert list(iter_chunks("A short lecture.", max_chars=100)) == ["A short lecture."]
+
+
+def test_units_join_back_into_the_text():
+    text = "First point. Second point!\n\n[00:12] Timestamped line\n00:15 another one? Done"
+    units = list(iter_units(text))
+    assert "".join(units) == text
+    assert units[0] == "First point. "
+    assert any(unit.startswith("[00:12]") for unit in units)
+    assert any(unit.startswith("00:15") for unit in units)
+
+
+def test_chunks_end_on_sentence_boundaries_within_the_limit():
+    chunks = list(iter_chunks(SENTENCES, max_chars=200, overlap=50))
+    assert len(chunks) > 5
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert all(chunk.rstrip().endswith(".") for chunk in chunks)
+
+
+def test_neighbouring_chunks_overlap_and_nothing_is_lost():
+    chunks = list(iter_chunks(SENTENCES, max_chars=200, overlap=50))
+    for previous, chunk in zip(chunks, chunks[1:]):
+        first_sentence = chunk[:chunk.index(".") + 1]
+        assert first_sentence in previous
+    for i in range(60):
+        assert any(f"Sentence number {i} " in chunk for chunk in chunks)
+
+
+def test_chunks_split_before_timestamps():
+    text = "\n".join(f"[00:{i:02d}] caption line {i} without punctuation" for i in range(40))
+    chunks = list(iter_chunks(text, max_chars=300, overlap=0))
+    assert all(len(chunk) <= 300 for chunk in chunks)
+    assert all(chunk.startswith("[00:") for chunk in chunks)
+
+
+def test_run_on_text_is_hard_split():
+    text = "word " * 200
+    chunks = list(iter_chunks(text, max_chars=150, overlap=20))
+    assert all(len(chunk) <= 150 for chunk in chunks)
+    assert "".join(chunks) == text
+
+
+def test_normalize_label():
+    assert normalize_label("Neural-Network (NN)!") == "neural network nn"
+    assert normalize_label(42) == "42"
+
+
+# --- MERGE ---
+def test_chunks_reusing_an_id_for_different_concepts_stay_apart():
+    first = {
+        "nodes": [{"id": "1", "label": "Gradient Descent", "type": "core"},
+                  {"id": "2", "label": "Learning Rate", "type": "sub"}],
+        "edges": [{"source": "1", "target": "2", "label": "tuned by"}],
+    }
+    second = {
+        "nodes": [{"id": "1", "label": "Backpropagation", "type": "core"},
+                  {"id": "2", "label": "Chain Rule", "type": "sub"}],
+        "edges": [{"source": "1", "target": "2", "label": "uses"}],
+    }
+    merged = merge_graphs([first, second])
+
+    labels = {node["id"]: node["label"] for node in merged["nodes"]}
+    assert len(labels) == len(merged["nodes"]) == 4
+    edges = {(labels[e["source"]], labels[e["target"]], e["label"]) for e in merged["edges"]}
+    assert edges == {("Gradient Descent", "Learning Rate", "tuned by"),
+                     ("Backpropagation", "Chain Rule", "uses")}
+
+
+def test_same_concept_across_chunks_is_merged_onto_the_first_id():
+    first = {"nodes": [{"id": "1", "label": "Neural Network", "type": "sub"},
+                       {"id": "2", "label": "Neuron", "type": "sub"}],
+             "edges": [{"source": "2", "target": "1", "label": "part of"}]}
+    second = {"nodes": [{"id": "7", "label": "neural  network!", "type": "core"},
+                        {"id": "8", "label": "Activation", "type": "sub"}],
+              "edges": [{"source": "7", "target": "8", "label": "uses"},
+                        {"source": "7", "target": "7", "label": "self"}]}
+    merged = merge_graphs([first, second])
+
+    by_id = {node["id"]: node for node in merged["nodes"]}
+    assert set(by_id) == {"1", "2", "8"}
+    assert by_id["1"]["type"] == "core"
+    assert {(e["source"], e["target"]) for e in merged["edges"]} == {("2", "1"), ("1", "8")}
@@ -0,0 +1,32 @@
+"""
+Assembling the directories the local Streamlit components are served from.
+"""
+import os
+
+from src import components
+from src.components import install_component
+
+
+def test_installs_files_and_subdirs_and_refreshes_outdated_ones(tmp_path, monkeypatch):
+    monkeypatch.setattr(components, "DEFAULT_CACHE_DIR", str(tmp_path / "cache"))
+    source = tmp_path / "page.html"
+    source.write_text("v1")
+    directory = install_component("demo_view", {"index.html": str(source)}, subdirs=("audio",))
+    assert directory == str(tmp_path / "cache" / "demo_view")
+    assert open(os.path.join(directory, "index.html")).read() == "v1"
+    assert os.path.isdir(os.path.join(directory, "audio"))
+
+    source.write_text("v2")
+    install_component("demo_view", {"index.html": str(source)})
+    assert open(os.path.join(directory, "index.html")).read() == "v2"
+
+
+def test_falls_back_to_a_temp_dir_when_the_cache_dir_is_unusable(tmp_path, monkeypatch):
+    blocker = tmp_path / "not-a-directory"
+    blocker.write_text("")
+    monkeypatch.setattr(components, "DEFAULT_CACHE_DIR", str(blocker))
+    source = tmp_path / "page.html"
+    source.write_text("page")
+    directory = install_component("demo_view", {"index.html": str(source)})
+    assert os.path.basename(directory).startswith("vidgraph-demo-view-")
+    assert open(os.path.join(directory, "index.html")).read() == "page"
@@ -0,0 +1,134 @@
+"""
+Background jobs on both queue backends, with the pipeline and the summary
+stream replaced by stubs (no model calls).
+"""
+import threading
+import time
+
+import pytest
+
+import src.jobs as jobs
+from src.jobs import JobRunner, MemoryQueue, SQLiteQueue
+
+
+class FakeRun:
+    """Stands in for PipelineRun: every requested stage succeeds at once."""
+
+    def __init__(self, transcript, api_key, persona="Standard", tasks=("graph", "quiz", "summary"), combined=False):
+        self.tasks = ("graph", "quiz", "summary") if combined else tasks
+
+    def results(self):
+        outputs = {"graph": {"nodes": [], "edges": []}, "quiz": [{"question": "?"}], "summary": "All fine."}
+        for task in self.tasks:
+            yield task, outputs[task]
+
+
+def broken_stream(transcript, api_key, persona="Standard"):
+    yield "The lecture starts with"
+    raise ConnectionError("stream reset")
+
+
+def good_stream(transcript, api_key, persona="Standard"):
+    yield "Error generating summary tables is the topic. "
+    yield "That is all."
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def runner(request, monkeypatch, tmp_path):
+    monkeypatch.setattr(jobs, "PipelineRun", FakeRun)
+    queue = MemoryQueue() if request.param == "memory" else SQLiteQueue(str(tmp_path / "jobs.db"))
+    runner = JobRunner(queue, workers=1)
+    yield runner
+    runner.close()
+
+
+def wait_finished(runner, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = runner.get(job_id)
+        if job["status"] in jobs.FINISHED:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job still {job['status']}")
+
+
+# --- SUMMARY STAGE ---
+def test_summary_stream_that_breaks_off_fails_the_job(runner, monkeypatch):
+    monkeypatch.setattr(jobs, "stream_summary", broken_stream)
+    job = wait_finished(runner, runner.submit("transcript", "key")["id"])
+    assert job["stages"]["summary"]["status"] == "error"
+    assert "stream reset" in job["results"]["summary"]
+    assert job["stages"]["graph"]["status"] == "done"
+    assert job["status"] == "failed"
+
+
+def test_streamed_summary_is_judged_by_the_stream_not_its_text(runner, monkeypatch):
+    monkeypatch.setattr(jobs, "stream_summary", good_stream)
+    job = wait_finished(runner, runner.submit("transcript", "key")["id"])
+    assert job["stages"]["summary"]["status"] == "done"
+    assert job["status"] == "done"
+
+
+# --- STALE JOBS ---
+def orphan(queue, transcript, status="running"):
+    """A job left behind by a runner that died without finishing it."""
+    job, _ = queue.enqueue(jobs.new_job(transcript), transcript)
+    queue.update(job["id"], {"status": status, "owner": "dead-runner"})
+    return job
+
+
+def test_jobs_of_a_live_runner_are_not_stale(runner, monkeypatch):
+    monkeypatch.setattr(jobs, "stream_summary", good_stream)
+    job = runner.submit("transcript", "key")
+    assert job["owner"] == runner.owner
+    assert not runner.is_stale(job)
+
+
+def test_jobs_of_a_dead_runner_are_stale_and_resubmitted(runner, monkeypatch):
+    monkeypatch.setattr(jobs, "stream_summary", good_stream)
+    runner.queue.beat("dead-runner", time.time() - jobs.RUNNER_DEAD_AFTER - 1)
+    for status in ("queued", "running"):
+        transcript = f"transcript {status}"
+        stale = orphan(runner.queue, transcript, status)
+        assert runner.is_stale(runner.get(stale["id"]))
+        job = runner.submit(transcript, "key")
+        assert job["owner"] == runner.owner
+        assert wait_finished(runner, job["id"])["status"] == "done"
+
+
+def test_sqlite_queue_tracks_runner_heartbeats(tmp_path):
+    queue = SQLiteQueue(str(tmp_path / "jobs.db"))
+    now = time.time()
+    queue.beat("runner", now)
+    assert queue.alive("runner", now)
+    assert not queue.alive("runner", now + jobs.RUNNER_DEAD_AFTER + 1)
+    assert not queue.alive("unknown", now)
+
+
+# --- STORAGE ---
+def test_transcript_is_stored_apart_from_the_polled_job(runner, monkeypatch):
+    monkeypatch.setattr(jobs, "stream_summary", good_stream)
+    transcript = "A long lecture transcript. " * 1000
+    job = wait_finished(runner, runner.submit(transcript, "key")["id"])
+    assert "transcript" not in job
+    assert runner.queue.transcript(job["id"]) == transcript
+    assert job["results"]["summary"] == "Error generating summary tables is the topic. That is all."
+
+
+def test_saves_write_only_the_given_fields(tmp_path):
+    queue = SQLiteQueue(str(tmp_path / "jobs.db"))
+    job, _ = queue.enqueue(jobs.new_job("transcript", persona="ELI5"), "transcript")
+    queue.update(job["id"], {"partial_summary": "So far", "persona": "ignored"})
+    saved = queue.get(job["id"])
+    assert saved["partial_summary"] == "So far"
+    assert saved["persona"] == "ELI5"
+    assert saved["stages"] == job["stages"]
+    assert saved["updated"] >= job["updated"]
+
+
+def test_close_stops_the_runner_threads(runner):
+    names = lambda: {t.name for t in threading.enumerate()}
+    assert "vidgraph-job-heartbeat" in names()
+    runner.close()
+    time.sleep(0.05)
+    assert not any(name.startswith("vidgraph-job") for name in names())
@@ -0,0 +1,168 @@
+"""
+LLMClient retries, circuit breaker and request coalescing, on the offline
+fake backend (no network, no real sleeping).
+"""
+import threading
+
+import pytest
+
+from src.backends import FakeBackend
+from src.llm_client import CircuitBreaker, CircuitOpenError, LLMClient, request_key
+
+
+class FlakyModel:
+    """A fake model whose first `failures` calls raise `error`."""
+
+    def __init__(self, failures, error=ConnectionError("connection reset")):
+        self.backend = FakeBackend()
+        self.model = self.backend.create_model("models/fake")
+        self.model_name = self.model.model_name
+        self.failures = failures
+        self.error = error
+        self.attempts = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise self.error
+        return self.model.generate_content(prompt, **kwargs)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_client(max_retries=4, breaker=None):
+    sleeps = []
+    client = LLMClient(breaker=breaker or CircuitBreaker(), max_retries=max_retries,
+                       sleep=sleeps.append, rng=lambda: 0.5)
+    return client, sleeps
+
+
+# --- RETRIES AND BACKOFF ---
+def test_retries_transient_errors_with_backoff():
+    client, sleeps = make_client()
+    model = FlakyModel(failures=3)
+    response = client.call(model, "Generate 3 multiple-choice questions about graphs")
+    assert response.text
+    assert model.attempts == 4
+    assert sleeps == [client.backoff(0), client.backoff(1), client.backoff(2)]
+
+
+def test_backoff_is_capped_exponential_with_jitter():
+    client = LLMClient(base_delay=1.0, max_delay=10.0, rng=lambda: 1.0)
+    assert [client.backoff(a) for a in range(5)] == [1.0, 2.0, 4.0, 8.0, 10.0]
+    client = LLMClient(base_delay=1.0, max_delay=10.0, rng=lambda: 0.0)
+    assert [client.backoff(a) for a in range(3)] == [0.5, 1.0, 2.0]
+
+
+def test_gives_up_after_max_retries():
+    client, sleeps = make_client(max_retries=2)
+    model = FlakyModel(failures=10)
+    with pytest.raises(ConnectionError):
+        client.call(model, "prompt")
+    assert model.attempts == 3
+    assert len(sleeps) == 2
+
+
+def test_bad_requests_are_not_retried():
+    client, sleeps = make_client()
+    model = FlakyModel(failures=10, error=ValueError("invalid argument"))
+    with pytest.raises(ValueError):
+        client.call(model, "prompt")
+    assert model.attempts == 1
+    assert sleeps == []
+    assert not client.breaker.is_open
+
+
+# --- CIRCUIT BREAKER ---
+def test_one_request_does_not_open_the_breaker():
+    client, _ = make_client(max_retries=4, breaker=CircuitBreaker(failure_threshold=2))
+    with pytest.raises(ConnectionError):
+        client.call(FlakyModel(failures=10), "prompt")
+    assert not client.breaker.is_open
+
+
+def test_breaker_opens_after_failed_requests_and_fails_fast():
+    clock = FakeClock()
+    client, _ = make_client(max_retries=1, breaker=CircuitBreaker(failure_threshold=2, clock=clock))
+    model = FlakyModel(failures=10)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            client.call(model, "prompt")
+    assert client.breaker.is_open
+
+    attempts = model.attempts
+    with pytest.raises(CircuitOpenError):
+        client.call(model, "prompt")
+    assert model.attempts == attempts  # Failed fast, the model was not called
+
+
+def test_breaker_half_open_trial_closes_or_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0, clock=clock)
+    client, _ = make_client(max_retries=0, breaker=breaker)
+    with pytest.raises(ConnectionError):
+        client.call(FlakyModel(failures=10), "prompt")
+    assert breaker.is_open
+
+    # After the timeout one trial goes through; failing it re-opens the circuit
+    clock.now = 31.0
+    model = FlakyModel(failures=1)
+    client.max_retries = 3
+    with pytest.raises(ConnectionError):
+        client.call(model, "prompt")
+    assert model.attempts == 1
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        client.call(model, "prompt")
+
+    # A successful trial closes it
+    clock.now = 62.0
+    assert client.call(model, "prompt").text
+    assert not breaker.is_open
+
+
+# --- COALESCING ---
+def call_concurrently(client, model, calls):
+    """Runs client.call(model, prompt, api_key) for each (prompt, api_key) at once."""
+    barrier = threading.Barrier(len(calls))
+    results = [None] * len(calls)
+
+    def run(i, prompt, api_key):
+        barrier.wait()
+        results[i] = client.call(model, prompt, api_key=api_key)
+
+    threads = [threading.Thread(target=run, args=(i, *call)) for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_identical_concurrent_requests_share_one_call():
+    backend = FakeBackend(latency=0.2)
+    model = backend.create_model("models/fake")
+    results = call_concurrently(LLMClient(), model, [("Generate 3 multiple-choice questions", "key")] * 5)
+    assert backend.calls == 1
+    assert len({id(r) for r in results}) == 1
+
+
+def test_requests_with_different_keys_are_not_shared():
+    backend = FakeBackend(latency=0.2)
+    model = backend.create_model("models/fake")
+    call_concurrently(LLMClient(), model, [("prompt", "key-a"), ("prompt", "key-b"), ("prompt", "key-a")])
+    assert backend.calls == 2
+
+
+def test_request_key_hashes_the_api_key():
+    model = FakeBackend().create_model("models/fake")
+    key = request_key(model, "prompt", {}, "secret-key")
+    assert key != request_key(model, "prompt", {}, "other-key")
+    assert key == request_key(model, "prompt", {}, "secret-key")
+    assert "secret-key" not in key
@@ -0,0 +1,81 @@
+"""
+Chunked extraction on the offline fake backend: a long transcript either
+yields a complete result or fails, and only complete results are cached.
+"""
+import pytest
+
+from src import llm_engine
+from src.backends import FakeBackend
+from src.cache import MemoryCache, set_cache
+from src.chunking import MAX_CHARS, iter_chunks
+
+MARKER = "Zanzibarquark"
+
+
+class FailingBackend(FakeBackend):
+    """Rejects (as a bad request, so without retries) every prompt that contains `marker`."""
+
+    def __init__(self, marker):
+        super().__init__()
+        self.marker = marker
+
+    def create_model(self, model_name):
+        model = super().create_model(model_name)
+        generate = model.generate_content
+
+        def generate_content(prompt, **kwargs):
+            if self.marker in prompt:
+                raise ValueError("invalid argument")
+            return generate(prompt, **kwargs)
+
+        model.generate_content = generate_content
+        return model
+
+
+def long_transcript(sections=4):
+    """About `sections` chunks of distinct lecture text; the marker sits in the middle of the third."""
+    parts = []
+    for i in range(sections):
+        sentences = [f"Section {i} covers topic{i} entropy{i} and gradient{i} descent number {j}." for j in range(500)]
+        if i == 2:
+            sentences[250] = f"The {MARKER} result appears here."
+        parts.append(" ".join(sentences))
+    return "\n\n".join(parts)
+
+
+@pytest.fixture
+def cache():
+    llm_engine.set_backend(FailingBackend(MARKER))
+    cache = MemoryCache()
+    set_cache(cache)
+    yield cache
+    llm_engine.set_backend(None)
+    set_cache(None)
+
+
+def test_transcript_spans_several_chunks_with_one_failing():
+    chunks = list(iter_chunks(long_transcript()))
+    assert len(chunks) >= 4
+    assert all(len(chunk) <= MAX_CHARS for chunk in chunks)
+    assert sum(MARKER in chunk for chunk in chunks) == 1
+
+
+def test_one_failed_chunk_fails_the_graph_and_caches_nothing(cache):
+    transcript = long_transcript()
+    data = llm_engine.extract_knowledge_graph(transcript, "key")
+    assert "error" in data
+    assert cache.get(llm_engine.cache_key(transcript, "Standard", "graph", "models/fake")) is None
+
+
+def test_one_failed_chunk_fails_the_summary_and_caches_nothing(cache):
+    transcript = long_transcript()
+    with pytest.raises(ValueError):
+        list(llm_engine.stream_summary(transcript, "key"))
+    assert cache.get(llm_engine.cache_key(transcript, "Standard", "summary", "models/fake")) is None
+
+
+def test_complete_graph_is_cached(cache):
+    transcript = long_transcript().replace(MARKER, "ordinary")
+    data = llm_engine.extract_knowledge_graph(transcript, "key")
+    assert "error" not in data and data["nodes"]
+    assert cache.get(llm_engine.cache_key(transcript, "Standard", "graph", "models/fake")) == data
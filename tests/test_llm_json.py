@@ -0,0 +1,140 @@
+"""
+Pulling JSON out of raw model output: extraction, repair of near-JSON,
+truncated output and the graph/quiz validators.
+"""
+import pytest
+
+from src.llm_json import VALIDATORS, balanced_span, parse_json, repair_json, validate_graph, validate_quiz
+
+GRAPH = '{"nodes": [{"id": "1", "label": "Entropy", "type": "core"}], "edges": []}'
+
+
+# --- EXTRACTION ---
+def test_object_embedded_in_prose():
+    text = f"Sure! Here is the graph you asked for:\n{GRAPH}\nLet me know if you need more."
+    value, problems = parse_json(text, VALIDATORS["graph"])
+    assert value["nodes"][0]["label"] == "Entropy"
+    assert problems == []
+
+
+def test_object_in_a_code_fence():
+    text = f"```json\n{GRAPH}\n```"
+    value, _ = parse_json(text)
+    assert value == {"nodes": [{"id": "1", "label": "Entropy", "type": "core"}], "edges": []}
+
+
+def test_brackets_inside_strings_do_not_end_the_value():
+    text = 'x {"label": "f(x) = [a, b} ok", "n": 1} trailing'
+    assert balanced_span(text, 2) == '{"label": "f(x) = [a, b} ok", "n": 1}'
+    assert parse_json(text) == ({"label": "f(x) = [a, b} ok", "n": 1}, [])
+
+
+def test_validator_skips_an_earlier_value_of_the_wrong_shape():
+    text = f'Schema: {{"nodes": "list"}}. Answer: {GRAPH}'
+    value, problems = parse_json(text, VALIDATORS["graph"])
+    assert value["nodes"][0]["id"] == "1"
+    assert problems == []
+
+
+def test_no_json_at_all():
+    assert parse_json("I could not build a graph for this text.") == (None, ["no JSON object or array found"])
+    assert parse_json(None) == (None, ["no JSON object or array found"])
+
+
+# --- REPAIR ---
+def test_trailing_commas_and_comments():
+    text = '{"a": [1, 2, 3,], // the list\n "b": {"c": 1,}, /* done */}'
+    assert parse_json(text) == ({"a": [1, 2, 3], "b": {"c": 1}}, [])
+
+
+def test_single_quotes():
+    text = "{'label': 'Newton\\'s law', 'quote': 'he said \"F = ma\"'}"
+    assert parse_json(text) == ({"label": "Newton's law", "quote": 'he said "F = ma"'}, [])
+
+
+def test_python_literals():
+    value, _ = parse_json("{'core': True, 'hidden': False, 'parent': None, 'name': 'Trueness'}")
+    assert value == {"core": True, "hidden": False, "parent": None, "name": "Trueness"}
+
+
+def test_raw_newlines_inside_strings():
+    assert parse_json('{"text": "line one\nline two"}') == ({"text": "line one\nline two"}, [])
+
+
+def test_repair_closes_open_strings_and_brackets():
+    assert repair_json('{"a": [1, {"b": "tex') == '{"a": [1, {"b": "tex"}]}'
+
+
+# --- TRUNCATED OUTPUT ---
+def test_truncated_graph_keeps_the_complete_nodes():
+    text = ('{"nodes": [{"id": "1", "label": "Entropy", "type": "core"}, '
+            '{"id": "2", "label": "Information", "type": "sub"}, {"id": "3", "lab')
+    value, _ = parse_json(text, VALIDATORS["graph"])
+    assert [node["label"] for node in value["nodes"]][:2] == ["Entropy", "Information"]
+    assert value["edges"] == []
+
+
+def test_truncated_quiz_keeps_the_complete_questions():
+    text = ('[{"question": "Q1?", "options": ["a", "b"], "answer": "a"}, '
+            '{"question": "Q2?", "options": ["a", "b"], "ans')
+    value, _ = parse_json(text, VALIDATORS["quiz"])
+    assert [q["question"] for q in value] == ["Q1?"]
+
+
+# --- VALIDATORS ---
+def test_graph_validator_fixes_what_it_can():
+    value, problems = validate_graph({
+        "nodes": [{"id": 1, "label": "Entropy", "type": "main"}, {"label": "Bits"}, {"type": "core"}],
+        "edges": [{"source": 1, "target": "Bits"}, {"source": 1}],
+    })
+    assert value["nodes"] == [{"id": "1", "label": "Entropy", "type": "sub"},
+                              {"id": "Bits", "label": "Bits", "type": "sub"}]
+    assert value["edges"] == [{"source": "1", "target": "Bits"}]
+    assert len(problems) == 2
+
+
+@pytest.mark.parametrize("value", [[], {"edges": []}, {"nodes": {}}, {"nodes": [], "edges": []}])
+def test_graph_validator_rejects(value):
+    assert validate_graph(value)[0] is None
+
+
+def test_delta_may_have_no_nodes():
+    value, problems = VALIDATORS["graph_delta"]({"nodes": [], "edges": [{"source": "1", "target": "2"}]})
+    assert value == {"nodes": [], "edges": [{"source": "1", "target": "2"}]}
+    assert problems == []
+
+
+def test_quiz_answers_given_as_letters_or_in_another_case():
+    value, problems = validate_quiz({"questions": [
+        {"question": "Q1?", "options": ["Bits", "Nats"], "answer": "B"},
+        {"question": "Q2?", "options": ["Bits", "Nats"], "answer": " bits "},
+    ]})
+    assert [q["answer"] for q in value] == ["Nats", "Bits"]
+    assert all(q["explanation"] == "" for q in value)
+    assert problems == []
+
+
+@pytest.mark.parametrize("item", [
+    {"question": "No options?", "answer": "a"},
+    {"question": "One option?", "options": ["a"], "answer": "a"},
+    {"question": "Unknown answer?", "options": ["a", "b"], "answer": "c"},
+    {"question": "Letter out of range?", "options": ["a", "b"], "answer": "D"},
+    "not a question",
+])
+def test_quiz_validator_rejects(item):
+    value, problems = validate_quiz([item])
+    assert value is None
+    assert len(problems) == 1
+
+
+def test_quiz_validator_drops_broken_questions_only():
+    value, problems = validate_quiz([{"question": "Q1?", "options": ["a", "b"], "answer": "a"},
+                                     {"question": "Q2?", "options": ["a"], "answer": "a"}])
+    assert [q["question"] for q in value] == ["Q1?"]
+    assert len(problems) == 1
+
+
+def test_problems_describe_the_first_candidate():
+    value, problems = parse_json('{"nodes": "none"}', VALIDATORS["graph"])
+    assert value is None
+    assert problems[0] == "expected an object with a 'nodes' list"
@@ -0,0 +1,82 @@
+"""
+Study guide PDFs: every call builds its own document, and CJK text is drawn
+from a fallback font. The CJK font is a tiny one generated here.
+"""
+import threading
+
+import pytest
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+from src import pdf_generator
+from src.pdf_generator import create_pdf, find_fonts
+
+pytestmark = pytest.mark.skipif(find_fonts() is None, reason="no Unicode TTF font installed")
+
+GRAPH = {"nodes": [{"id": "1", "label": "Gradient Descent", "type": "core"},
+                   {"id": "2", "label": "Learning Rate", "type": "sub"}],
+         "edges": [{"source": "1", "target": "2", "label": "tuned by"}]}
+QUIZ = [{"question": "What does the learning rate scale?", "options": ["A) The gradient step", "B) The loss"],
+         "answer": "A"}]
+CJK = "你好世界"
+
+
+def box_glyph():
+    pen = TTGlyphPen(None)
+    for x, y in [(100, 0), (100, 700), (600, 700), (600, 0)]:
+        (pen.lineTo if pen.points else pen.moveTo)((x, y))
+    pen.closePath()
+    return pen.glyph()
+
+
+def write_cjk_font(path):
+    """A TrueType font with a box glyph for each character of CJK."""
+    names = [".notdef"] + [f"uni{ord(c):04X}" for c in CJK]
+    builder = FontBuilder(1000, isTTF=True)
+    builder.setupGlyphOrder(names)
+    builder.setupCharacterMap({ord(c): f"uni{ord(c):04X}" for c in CJK})
+    builder.setupGlyf({name: box_glyph() for name in names})
+    builder.setupHorizontalMetrics({name: (1000, 100) for name in names})
+    builder.setupHorizontalHeader(ascent=880, descent=-120)
+    builder.setupNameTable({"familyName": "TestCJK", "styleName": "Regular"})
+    builder.setupOS2(sTypoAscender=880, sTypoDescender=-120, usWinAscent=880, usWinDescent=120)
+    builder.setupPost()
+    builder.save(str(path))
+
+
+@pytest.fixture
+def cjk_font(tmp_path, monkeypatch):
+    path = tmp_path / "TestCJK.ttf"
+    write_cjk_font(path)
+    monkeypatch.setenv("VIDGRAPH_PDF_CJK_FONT", str(path))
+    pdf_generator.find_cjk_font.cache_clear()
+    yield path
+    pdf_generator.find_cjk_font.cache_clear()
+
+
+def test_cjk_text_is_drawn_from_the_fallback_font(cjk_font):
+    pdf = create_pdf(f"Summary: {CJK}", GRAPH, QUIZ)
+    assert pdf.startswith(b"%PDF") and b"TestCJK" in pdf
+
+
+def test_latin_guides_do_not_load_the_cjk_font(cjk_font):
+    pdf = create_pdf("Summary: gradients and learning rates.", GRAPH, QUIZ)
+    assert b"TestCJK" not in pdf
+
+
+def test_guides_built_one_after_another_and_in_parallel_are_all_complete():
+    texts = [f"Summary {i}: " + " ".join(f"concept{i}x{j}" for j in range(50)) for i in range(6)]
+    serial = [create_pdf(text, GRAPH, QUIZ) for text in texts]
+    parallel = [None] * len(texts)
+
+    def build(i):
+        parallel[i] = create_pdf(texts[i], GRAPH, QUIZ)
+
+    threads = [threading.Thread(target=build, args=(i,)) for i in range(len(texts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for a, b in zip(serial, parallel):
+        assert a.startswith(b"%PDF") and b.rstrip().endswith(b"%%EOF")
+        assert len(a) == len(b)